@@ -20,32 +20,142 @@
 import datetime
 import math
 import enum
+import copy
+import bisect
+import numbers
+import os
+import itertools
+import collections
+import concurrent.futures
+import random
+import array
+import fractions
+import csv
+import json
+import time
+import html
+import hashlib
+import pickle
 
 from jinja2 import Template, Environment, FileSystemLoader
 
+# Optional dependency (BatchSimulator)
+try:
+	import numpy
+except ImportError:
+	numpy=None
+
+# Optional dependency (PlanLoader, TOML plans)
+try:
+	import tomllib
+except ImportError:
+	tomllib=None
+
+# Value objects (Event, KeyDate, SubjectAndEdSource, Milestone, 
+# TimeIntervalDescrRecord) use __slots__: no per-instance __dict__
 class Event(object):
-	def __init__(self, message, payload=None):
+	__slots__=("__message", "__payload", "__subType")
+	# subType - optional event kind within the message 
+	# (DateType for "KeyDate" events)
+	def __init__(self, message, payload=None, subType=None):
 		self.__message=message
 		self.__payload=payload
+		self.__subType=subType
 	def getMessage(self):
 		return self.__message
 	def getPayload(self):
 		return self.__payload
+	def getSubType(self):
+		return self.__subType
 
+# Typed event bus.
+# Handlers are subscribed to:
+#   None - all events
+#   message - all events with this message
+#   (message, subType) - events with this message and subtype
+# Handler lists for each (message, subType) pair are built on the 
+# first event, so dispatch is a single dict lookup. Handlers are 
+# called in the order of subscription.
 class IEventSource(object):
 	def __init__(self):
-		self.__eventListeners=[]
+		# (listener, key, handler)
+		self.__subscriptions=[]
+		# (message, subType) -> list of handlers
+		self.__dispatchTable={}
+	
+	# If the listener provides handlers (getEventHandlers), only 
+	# they are subscribed, otherwise onEvent receives all events.
+	# A listener whose class overrides onEvent (e.g. a subclass of 
+	# SimpleView extending its onEvent) receives all events in onEvent.
 	def addEventListener(self, listener):
-		self.__eventListeners.append(listener)
+		handlers=None
+		if hasattr(listener, "getEventHandlers") and \
+				getattr(type(listener), "onEvent", None) \
+					is IEventListener.onEvent:
+			handlers=listener.getEventHandlers()
+		if handlers==None:
+			self.subscribe(None, listener.onEvent, listener)
+		else:
+			for key in handlers:
+				self.subscribe(key, handlers[key], listener)
+	
+	def removeEventListener(self, listener):
+		subscriptions=[]
+		for subscription in self.__subscriptions:
+			if subscription[0] is not listener:
+				subscriptions.append(subscription)
+		self.__subscriptions=subscriptions
+		self.__dispatchTable={}
+	
+	def subscribe(self, key, handler, listener=None):
+		self.__subscriptions.append((listener, key, handler))
+		self.__dispatchTable={}
+	
+	def hasEventListeners(self):
+		return len(self.__subscriptions)>0
+	
+	# Is anybody subscribed to the events of this kind?
+	# Allows not to build events (and their payloads) which 
+	# nobody receives
+	def hasEventHandlers(self, message, subType=None):
+		return len(self.__getHandlers((message, subType)))>0
+	
+	def __getHandlers(self, dispatchKey):
+		handlers=self.__dispatchTable.get(dispatchKey)
+		if handlers==None:
+			message, subType = dispatchKey
+			handlers=[]
+			for listener, key, handler in self.__subscriptions:
+				if key==None or key==message or key==dispatchKey:
+					handlers.append(handler)
+			self.__dispatchTable[dispatchKey]=handlers
+		return handlers
+	
 	def fireEvent(self, event):
-		for listener in self.__eventListeners:
-			listener.onEvent(event)
+		for handler in self.__getHandlers(
+				(event.getMessage(), event.getSubType())):
+			handler(event)
 			
 class IEventListener(object): #informal interface
-	def onEvent(self, event): # abstract method
-		raise Exception("Interface method not implemented")
+	# Abstract method (if getEventHandlers is not implemented)
+	def onEvent(self, event):
+		handlers=self.getEventHandlers()
+		if handlers==None:
+			raise Exception("Interface method not implemented")
+		handler=handlers.get((event.getMessage(), event.getSubType()))
+		if handler==None:
+			handler=handlers.get(event.getMessage())
+		if handler!=None:
+			handler(event)
+	
+	# Typed subscription: 
+	# {message or (message, subType): handler} or None (all events
+	# are passed to onEvent)
+	def getEventHandlers(self):
+		return None
 	
 class IDescriptable(object): #informal interface
+	__slots__=()
 	# Abstract method
 	# Returns a string with a text description of the object
 	def getDescr(self):
@@ -67,6 +177,11 @@ class AbstractEdSource(IEventSource, IDescriptable):
 	def getNExTotal(self):
 		return self.__nExTotal
 	
+	# Use ImitPlanner.replanSourceSize to change the size of the 
+	# source of the simulated plan
+	def setNExTotal(self, nExTotal):
+		self.__nExTotal=nExTotal
+	
 	def getTitle(self):
 		return self.__title
 	
@@ -78,11 +193,26 @@ class AbstractEdSource(IEventSource, IDescriptable):
 	def use(self, nExSolve=None, verbose=False):
 		if self.__fUse==False and verbose==True:
 			self.__fUse=True
-			self.fireEvent(Event("Source started!", self))
+			if self.hasEventHandlers("Source started!"):
+				self.fireEvent(Event("Source started!", self))
 		return self.solveEx(nExSolve)
+	
+	def isUsed(self):
+		return self.__fUse
 		
 	def solveEx(self, nExSolve):
 		raise Exception("Interface method not implemented")
+	
+	# Next-event engine
+	# Returns the number of days (counting the current one) after which 
+	# the source will be completed with the given daily performance
+	def getNDaysToComplete(self, nExPerDay, nDaysMax=None):
+		raise Exception("Interface method not implemented")
+	
+	# Next-event engine
+	# Quiet progress for several days without completion and events
+	def fastForward(self, nExPerDay, nDays):
+		raise Exception("Interface method not implemented")
 		
 	def getSourceName(self):
 		raise Exception("Interface method not implemented")
@@ -92,10 +222,35 @@ class AbstractEdSource(IEventSource, IDescriptable):
 	
 	def getProgressDescr(self): # string : nExSolved/nExTotal
 		raise Exception("Interface method not implemented")
+	
+	# Actual progress (see ImitPlanner.loadProgress): 
+	# the number of units done (days for FixedTimeTask)
+	def setProgress(self, progress):
+		raise Exception("Interface method not implemented")
+	
+	def getProgress(self):
+		raise Exception("Interface method not implemented")
 		
 	# Unit of measurement (tasks, videos, pages, etc)
 	def getUnitName(self):
 		return self.__unitName
+	
+	# Progress accounting (see ProgressAccounting): the performance 
+	# passed to solveEx is measured in sub-units, 
+	# 1 unit = unitScale sub-units
+	def setUnitScale(self, unitScale):
+		pass
+	
+	# Snapshot of the simulation state (tuple)
+	def getState(self):
+		return (self.__fUse,)
+	
+	def setState(self, state):
+		self.__fUse=state[0]
+	
+	# Return to the initial state
+	def reset(self):
+		self.__fUse=False
 		
 # AbstractEdSource implementation
 class AbstractProblemBook(AbstractEdSource): 
@@ -108,10 +263,14 @@ class AbstractProblemBook(AbstractEdSource):
 			isMandatory)
 		# private fields
 		self.__author = author
-		# solved tasks counter
+		# solved tasks counter (sub-units)
 		self.__exCounter=0
 		# book completion flag
 		self.__fComplete = False
+		
+		self.__unitScale=1
+		# nExTotal in sub-units
+		self.__total=nExTotal
 
 	# methods for returning private fields
 	def getAuthor(self):
@@ -130,11 +289,12 @@ class AbstractProblemBook(AbstractEdSource):
 				
 				# Установить MACH_EPS???
 				
-				if self.__exCounter+nExSolved>=self.getNExTotal():
-					rem = self.__exCounter+nExSolved-self.getNExTotal()
+				if self.__exCounter+nExSolved>=self.__total:
+					rem = self.__exCounter+nExSolved-self.__total
 					self.__fComplete = True
-					self.__exCounter = self.getNExTotal()
-					self.fireEvent(Event("Source completed!", self))
+					self.__exCounter = self.__total
+					if self.hasEventHandlers("Source completed!"):
+						self.fireEvent(Event("Source completed!", self))
 					return rem
 				else:
 					self.__exCounter+=nExSolved
@@ -147,8 +307,110 @@ class AbstractProblemBook(AbstractEdSource):
 			raise Exception("Error! This ed. source has already been"
 				" completed!")
 			
+	def setNExTotal(self, nExTotal):
+		AbstractEdSource.setNExTotal(self, nExTotal)
+		self.setUnitScale(self.__unitScale)
+	
+	def setUnitScale(self, unitScale):
+		self.__unitScale=unitScale
+		if unitScale==1:
+			self.__total=self.getNExTotal()
+		else:
+			self.__total=round(
+					fractions.Fraction(self.getNExTotal())*unitScale)
+	
+	# Next-event engine
+	# Multiples of 1/1024 less than 2**40 are summed without 
+	# rounding, so the daily accumulation can be replaced by 
+	# multiplication without changing the result
+	def __isExactAccumulation(self, nExPerDay):
+		return float(nExPerDay*1024).is_integer() \
+			and float(self.__exCounter*1024).is_integer() \
+			and self.__total+nExPerDay < 2**40
+	
+	def getNDaysToComplete(self, nExPerDay, nDaysMax=None):
+		# Integer sub-units (ProgressAccounting.EXACT)
+		if isinstance(nExPerDay, int) and \
+				isinstance(self.__exCounter, int):
+			rem = self.__total-self.__exCounter
+			return max(1, -(-rem//nExPerDay))
+		
+		if self.__isExactAccumulation(nExPerDay):
+			rem = self.__total-self.__exCounter
+			nDays = max(1, math.ceil(rem/nExPerDay))
+			# Correction of the division rounding error
+			while nDays>1 and self.__exCounter+(nDays-1)*nExPerDay \
+					>= self.__total:
+				nDays-=1
+			while self.__exCounter+nDays*nExPerDay < self.__total:
+				nDays+=1
+			return nDays
+		
+		# Replay of the daily accumulation for bit-for-bit 
+		# compatibility with the day-by-day simulation
+		exCounter=self.__exCounter
+		nDays=1
+		while exCounter+nExPerDay < self.__total:
+			if nDaysMax!=None and nDays>nDaysMax:
+				break
+			exCounter+=nExPerDay
+			nDays+=1
+		return nDays
+	
+	def fastForward(self, nExPerDay, nDays):
+		if (isinstance(nExPerDay, int) and \
+				isinstance(self.__exCounter, int)) or \
+				self.__isExactAccumulation(nExPerDay):
+			exCounter=self.__exCounter+nDays*nExPerDay
+		else:
+			exCounter=self.__exCounter
+			for i in range(nDays):
+				exCounter+=nExPerDay
+		if exCounter >= self.__total:
+			raise Exception("Error! The ed. source cannot be completed"
+				+ " during fast forward!")
+		self.__exCounter=exCounter
+		
+	def setProgress(self, nExSolved):
+		if nExSolved<0:
+			raise Exception("Error! The number of solved examples"
+				+ " is less then zero!")
+		AbstractEdSource.setState(self, (nExSolved>0,))
+		exCounter=nExSolved
+		if self.__unitScale!=1:
+			exCounter=round(fractions.Fraction(nExSolved)
+					*self.__unitScale)
+		self.__fComplete=exCounter>=self.__total
+		self.__exCounter=min(exCounter, self.__total)
+	
+	# Solved tasks (units) for ProgressTrace
+	def getProgress(self):
+		if self.__unitScale==1:
+			return self.__exCounter
+		return self.__exCounter/self.__unitScale
+	
+	# Solved tasks (units)
 	def getExCounter(self):
-		return self.__exCounter
+		if self.__unitScale==1:
+			return self.__exCounter
+		exCounter=fractions.Fraction(self.__exCounter, self.__unitScale)
+		if exCounter.denominator==1:
+			return exCounter.numerator
+		return float(exCounter)
+	
+	def getState(self):
+		return (AbstractEdSource.getState(self), self.__exCounter, 
+				self.__fComplete)
+	
+	def setState(self, state):
+		AbstractEdSource.setState(self, state[0])
+		self.__exCounter=state[1]
+		self.__fComplete=state[2]
+	
+	def reset(self):
+		AbstractEdSource.reset(self)
+		self.__exCounter=0
+		self.__fComplete=False
 		
 	def getDescr(self):
 		output="("+self.getSourceName()+") " 
@@ -158,7 +420,7 @@ class AbstractProblemBook(AbstractEdSource):
 		return output
 		
 	def getProgressDescr(self):
-		return str(self.__exCounter) +"/" + str(self.getNExTotal())
+		return str(self.getExCounter()) +"/" + str(self.getNExTotal())
 		
 
 class Book(AbstractProblemBook):
@@ -186,6 +448,17 @@ class FixedTimeTask(AbstractEdSource):
 		self.__nDays=nDays
 		self.__daysCounter=0
 		self.__fComplete= False
+	
+	def setNDays(self, nDays):
+		self.__nDays=nDays
+	
+	def setProgress(self, nDays):
+		if nDays<0:
+			raise Exception("Error! The number of days is less then"
+				+ " zero!")
+		AbstractEdSource.setState(self, (nDays>0,))
+		self.__fComplete=nDays>=self.__nDays
+		self.__daysCounter=min(nDays, self.__nDays)
 		
 	def isComplete(self):
 		return self.__fComplete
@@ -195,11 +468,41 @@ class FixedTimeTask(AbstractEdSource):
 			self.__daysCounter+=1
 			if self.__daysCounter==self.__nDays:
 				self.__fComplete=True
-				self.fireEvent(Event("Source completed!", self))
+				if self.hasEventHandlers("Source completed!"):
+					self.fireEvent(Event("Source completed!", self))
 			return 0
 		else:
 			raise Exception("Error! This ed. source has already been"
 				+ " completed!")
+	def getNDaysToComplete(self, p, nDaysMax=None):
+		return self.__nDays-self.__daysCounter
+	
+	def fastForward(self, p, nDays):
+		if self.__daysCounter+nDays >= self.__nDays:
+			raise Exception("Error! The ed. source cannot be completed"
+				+ " during fast forward!")
+		self.__daysCounter+=nDays
+	
+	def getNDays(self):
+		return self.__nDays
+	
+	def getProgress(self):
+		return self.__daysCounter
+	
+	def getState(self):
+		return (AbstractEdSource.getState(self), self.__daysCounter,
+				self.__fComplete)
+	
+	def setState(self, state):
+		AbstractEdSource.setState(self, state[0])
+		self.__daysCounter=state[1]
+		self.__fComplete=state[2]
+	
+	def reset(self):
+		AbstractEdSource.reset(self)
+		self.__daysCounter=0
+		self.__fComplete=False
+	
 	def getSourceName(self):
 		return "FTT" #issue #11
 	def getDescr(self):
@@ -212,10 +515,15 @@ class SubjectSolveExReturnCode(enum.Enum):
 	OK=0
 	LOCKED=1
 	
-class Subject(IDescriptable, IEventSource, IEventListener):
+class Subject(IDescriptable, IEventSource):
+	# startAfter - a subject or a list of subjects which must be 
+	# completed before the study of this subject begins
 	def __init__(self, name, startAfter=None):
 		IEventSource.__init__(self)
 		self.__edSourceList=[]
+		# (subject, ed. source) payloads of the source events, 
+		# one per source
+		self.__edSourcePairs=[]
 		# index of the current ed. source (book) in the list
 		self.__curEdSourceIndex=0
 		# Learning completion flag
@@ -223,7 +531,19 @@ class Subject(IDescriptable, IEventSource, IEventListener):
 		self.__fCompleteAllSubjects=False
 		
 		self.__name=name
-		self.__prevSubj=startAfter
+		
+		# Previous subjects (without duplicates)
+		prevSubjects=[]
+		if isinstance(startAfter, Subject):
+			prevSubjects.append(startAfter)
+		elif startAfter!=None:
+			for prevSubj in startAfter:
+				if not isinstance(prevSubj, Subject):
+					raise Exception("Error! startAfter must contain"
+							+ " subjects!")
+				if prevSubj not in prevSubjects:
+					prevSubjects.append(prevSubj)
+		self.__prevSubjects=tuple(prevSubjects)
 		
 		# Has the subject been used at least once? (issue #5)
 		self.__fUse=False
@@ -231,17 +551,111 @@ class Subject(IDescriptable, IEventSource, IEventListener):
 		
 		
 		# reopened issue #1
-		if startAfter!=None:
-			self.__fLocked=True
-		else:
-			self.__fLocked=False
+		self.__fLocked=len(self.__prevSubjects)>0
 			
 		# issue #14
 		self.__mandSubjCounter=0
+		# The number of mandatory sources which are not completed yet
+		self.__nMandRemaining=0
 	
 	def isLocked(self):
 		return self.__fLocked
+	
+	# Snapshot of the simulation state of the subject 
+	# and its ed. sources (tuple)
+	def getState(self):
+		sourceStates=[]
+		for edSource in self.__edSourceList:
+			sourceStates.append(edSource.getState())
+		return (self.__curEdSourceIndex, self.__nMandRemaining,
+				self.__fComplete, self.__fCompleteAllSubjects, 
+				self.__fUse, self.__fLocked, tuple(sourceStates))
+	
+	def setState(self, state):
+		self.__curEdSourceIndex, self.__nMandRemaining, \
+			self.__fComplete, self.__fCompleteAllSubjects, \
+			self.__fUse, self.__fLocked, sourceStates = state
+		for i in range(0, len(self.__edSourceList)):
+			self.__edSourceList[i].setState(sourceStates[i])
+	
+	# Return to the initial state
+	def reset(self):
+		self.__curEdSourceIndex=0
+		self.__nMandRemaining=self.__mandSubjCounter
+		self.__fComplete=False
+		self.__fCompleteAllSubjects=False
+		self.__fUse=False
+		self.__fLocked=len(self.__prevSubjects)>0
+		for edSource in self.__edSourceList:
+			edSource.reset()
 		
+	# Actual progress (see ImitPlanner.loadProgress).
+	# Sources are studied in order, so only the first incomplete 
+	# source may be partially studied.
+	def loadProgress(self, progress):
+		self.reset()
+		# The subject is completed: the sources up to the last 
+		# mandatory one (or the first one) are completed, the optional 
+		# sources after it are studied further
+		nCompleted=0
+		if progress.get(self)==True:
+			nCompleted=min(1, len(self.__edSourceList))
+			for index in range(0, len(self.__edSourceList)):
+				if self.__edSourceList[index].isMandatory():
+					nCompleted=index+1
+		for index in range(0, len(self.__edSourceList)):
+			edSource=self.__edSourceList[index]
+			if edSource in progress:
+				edSource.setProgress(progress[edSource])
+				if index<nCompleted and not edSource.isComplete():
+					raise Exception("Error! The subject is completed,"
+							+ " but its source is not: " 
+							+ edSource.getDescr())
+			elif index<nCompleted:
+				if isinstance(edSource, FixedTimeTask):
+					edSource.setProgress(edSource.getNDays())
+				else:
+					edSource.setProgress(edSource.getNExTotal())
+		
+		fIncomplete=False
+		for edSource in self.__edSourceList:
+			if edSource.isComplete() or edSource.isUsed():
+				if fIncomplete:
+					raise Exception("Error! Ed. sources are studied in"
+							+ " order: " + edSource.getDescr())
+			if edSource.isComplete():
+				self.__curEdSourceIndex+=1
+				if edSource.isMandatory():
+					self.__nMandRemaining-=1
+			else:
+				fIncomplete=True
+		
+		self.__fComplete=self.__curEdSourceIndex>0 and \
+				self.__nMandRemaining==0
+		self.__fCompleteAllSubjects= \
+				self.__curEdSourceIndex==len(self.__edSourceList)
+		self.__fUse=self.__curEdSourceIndex>0 or \
+				(len(self.__edSourceList)>0 and 
+					self.__edSourceList[0].isUsed())
+		# the study has already begun
+		if self.__fUse:
+			self.__fLocked=False
+	
+	# Start events for the state loaded by loadProgress (verbose 
+	# mode): the subject and its current source if they are not 
+	# completed yet
+	def fireProgressStarted(self):
+		if not self.__fUse:
+			return
+		if not self.__fComplete and \
+				self.hasEventHandlers("Subject started!"):
+			self.fireEvent(Event("Subject started!", self))
+		if self.__curEdSourceIndex<len(self.__edSourceList) and \
+				self.__edSourceList[self.__curEdSourceIndex].isUsed() \
+				and self.hasEventHandlers("Source started!"):
+			self.fireEvent(Event("Source started!", 
+					self.__edSourcePairs[self.__curEdSourceIndex]))
+	
 	def getUnfinishedSourcesStat(self): #issue #14
 		outputList=[]
 		for edSource in self.__edSourceList:
@@ -252,67 +666,84 @@ class Subject(IDescriptable, IEventSource, IEventListener):
 		return tuple(outputList)
 
 	# issue #7 
+	# The subject is unlocked when all previous subjects are completed
 	def unlock(self):
-		if (self.__prevSubj != None):
-			if (self.__prevSubj.isFinished()):
-				self.__fLocked=False
-				return 0
-			else:
-				return 1
+		if len(self.__prevSubjects)>0:
+			for prevSubj in self.__prevSubjects:
+				if not prevSubj.isFinished():
+					return 1
+			self.__fLocked=False
+			return 0
 		else:
 			return 1
 	
+	# The first previous subject (or None)
 	def getPrevSubject(self):
-		return self.__prevSubj
+		if len(self.__prevSubjects)>0:
+			return self.__prevSubjects[0]
+		return None
+	
+	def getPrevSubjects(self):
+		return self.__prevSubjects
+	
+	def getEdSources(self):
+		# protection from changes
+		return tuple(self.__edSourceList)
 	
 	def addEdSource(self, edSource):
 		# Add an element to the end of the list
 		self.__edSourceList.append(edSource)
-		edSource.addEventListener(self)
+		self.__edSourcePairs.append(SubjectAndEdSource(self, edSource))
 		if edSource.isMandatory(): #issue #14
 			self.__mandSubjCounter+=1
+			self.__nMandRemaining+=1
 	
-	# Event handler	
-	def onEvent(self, event):
-		if event.getMessage()=="Source completed!":
-			if self.__fComplete==False:
-				
-				# Duplicate event in planner
-				self.fireEvent(Event(event.getMessage(), 
-						SubjectAndEdSource(self,event.getPayload())))
-				
-				if self.__curEdSourceIndex<len(self.__edSourceList):
-					self.__curEdSourceIndex+=1
-					
-					# checking completion of subject studying
-					if self.__curEdSourceIndex+1 >= \
-							self.__mandSubjCounter:
-						
-						fCompl=True
-						for edSource in self.__edSourceList:
-							if not edSource.isComplete():
-								if edSource.isMandatory()==True:
-									fCompl=False
-						if fCompl:
-							self.__fComplete=True
-							self.fireEvent(Event("Subject completed!", 
-									self))
-
-					if self.__curEdSourceIndex==len(self.__edSourceList):
-						self.__fCompleteAllSubjects=True
-			else:
-				raise Exception("Error! This subject has already"
-						+ " been completed!")
-		
-		if event.getMessage()=="Source started!": #issue #5
+	# Completion of the current source is checked by the subject 
+	# itself after each use (no event relay).
+	# The subject is completed when all mandatory sources are 
+	# completed (issue #14), the study of the remaining optional 
+	# sources continues after that.
+	def __onSourceCompleted(self, edSource):
+		if self.__fCompleteAllSubjects==False:
+			
 			# Duplicate event in planner
-				self.fireEvent(Event(event.getMessage(), 
-						SubjectAndEdSource(self,event.getPayload())))
+			if self.hasEventHandlers("Source completed!"):
+				self.fireEvent(Event("Source completed!", 
+						self.__edSourcePairs[self.__curEdSourceIndex]))
+			
+			self.__curEdSourceIndex+=1
+			if edSource.isMandatory():
+				self.__nMandRemaining-=1
+			
+			# checking completion of subject studying
+			if self.__nMandRemaining==0 and self.__fComplete==False:
+				self.__fComplete=True
+				if self.hasEventHandlers("Subject completed!"):
+					self.fireEvent(Event("Subject completed!", self))
+
+			if self.__curEdSourceIndex==len(self.__edSourceList):
+				self.__fCompleteAllSubjects=True
+		else:
+			raise Exception("Error! This subject has already"
+					+ " been completed!")
+	
+	def __useCurSource(self, nExSolved, verbose):
+		edSource=self.__edSourceList[self.__curEdSourceIndex]
+		if verbose==True and not edSource.isUsed() and \
+				self.hasEventHandlers("Source started!"): #issue #5
+			self.fireEvent(Event("Source started!", 
+					self.__edSourcePairs[self.__curEdSourceIndex]))
+		rem=edSource.use(nExSolved, verbose)
+		if edSource.isComplete():
+			self.__onSourceCompleted(edSource)
+		return rem
+	
 	# issue #5
 	def __checkFirstUse(self, verbose):
 		if self.__fUse==False and verbose==True:
 			self.__fUse=True
-			self.fireEvent(Event("Subject started!", self))
+			if self.hasEventHandlers("Subject started!"):
+				self.fireEvent(Event("Subject started!", self))
 	
 	# To comply with the DRY principle
 	# def __subjProcessing(self, nExSolved, verbose):
@@ -324,22 +755,44 @@ class Subject(IDescriptable, IEventSource, IEventListener):
 				# self.__edSourceList[self.__curEdSourceIndex].use(
 						# rem, verbose)
 	
+	# nExSolved units are spent on consecutive sources: the remainder 
+	# of a completed source goes to the next one (issue #6), so one 
+	# call may complete several sources (the amount may be several 
+	# days' worth of output). A FixedTimeTask takes the call as 
+	# one day and passes nothing on.
 	def solveEx(self, nExSolved, verbose=False):
 
 		if self.__fLocked==False and nExSolved>0: #issue #8
 			self.__checkFirstUse(verbose) # issue #5
 			
-			rem=self.__edSourceList[self.__curEdSourceIndex].use(
-						nExSolved, verbose)
-			if rem>0: # issue #6
-				if self.isFullyComplete()==False: # BOGUS
-					self.__edSourceList[self.__curEdSourceIndex].use(
-						rem, verbose)
+			rem=nExSolved
+			while rem>0 and self.isFullyComplete()==False:
+				rem=self.__useCurSource(rem, verbose)
 						
 			return SubjectSolveExReturnCode.OK
 		else:
 			return SubjectSolveExReturnCode.LOCKED
 			
+	# Next-event engine
+	# Does the next call of solveEx generate any events?
+	def isUsed(self):
+		return self.__fUse and \
+			self.__edSourceList[self.__curEdSourceIndex].isUsed()
+	
+	# Next-event engine
+	def getNDaysToSourceCompletion(self, nExPerDay, nDaysMax=None):
+		return self.__edSourceList[self.__curEdSourceIndex]\
+				.getNDaysToComplete(nExPerDay, nDaysMax)
+	
+	# Next-event engine
+	def fastForward(self, nExPerDay, nDays):
+		self.__edSourceList[self.__curEdSourceIndex].fastForward(
+				nExPerDay, nDays)
+	
+	def setUnitScale(self, unitScale):
+		for edSource in self.__edSourceList:
+			edSource.setUnitScale(unitScale)
+	
 	def getNExTotal(self):
 		sum=0
 		for book in self.__edSourceList:
@@ -368,6 +821,7 @@ class DateType(enum.Enum):
 	MILESTONE=3
 
 class KeyDate(object):
+	__slots__=("__date", "__dateType", "__fEnd", "__payload")
 	def __init__(self, date, dateType, fEnd, payload=None):
 		self.__date=date
 		self.__dateType=dateType
@@ -401,6 +855,7 @@ class KeyDate(object):
 		return s
 
 class SubjectAndEdSource(IDescriptable):
+	__slots__=("__subj", "__edSource")
 	def __init__(self, subj, edSource):
 		self.__subj=subj
 		self.__edSource=edSource
@@ -416,21 +871,29 @@ class SubjectAndEdSource(IDescriptable):
 				
 
 class Milestone(IDescriptable):
+	__slots__=("__date", "__descr")
 	def __init__(self, date, descr):
 		self.__date=date
 		self.__descr=descr
 	def getDate(self):
 		return self.__date
+	# Use ImitPlanner.replanMilestone to move the milestone 
+	# of the simulated plan
+	def setDate(self, date):
+		self.__date=date
 	def getDescr(self):
 		return self.__descr
 
 class TimeIntervalDescrRecord(object):
+	__slots__=("__subjName", "__subjPerf", "__prevSubjName")
 	def __init__(self, subj, subjPerf):
 		self.__subjName=subj.getName()
 		self.__subjPerf=subjPerf
 		self.__prevSubjName=None
-		if subj.getPrevSubject()!=None:
-			self.__prevSubjName=subj.getPrevSubject().getDescr()
+		if len(subj.getPrevSubjects())>0:
+			self.__prevSubjName=", ".join(
+					[prevSubj.getDescr() 
+						for prevSubj in subj.getPrevSubjects()])
 	def getSubjName(self):
 		return self.__subjName
 	def getSubjPerf(self):
@@ -482,14 +945,30 @@ class TimeInterval(object):
 				"descr": outputList}
 				
 
+class SimulationEngine(enum.Enum):
+	DAY_STEP=0 # one day per cycle step
+	NEXT_EVENT=1 # jump to the next day with key dates
+
+# Accounting of the progress of sources
+class ProgressAccounting(enum.Enum):
+	FLOAT=0 # performance is accumulated as given (floats)
+	# integer sub-units: the results don't depend on the order of 
+	# accumulation, the engine and the process
+	EXACT=1
+
 class TrainingModesSharedFlag(enum.Enum):
 	SharedMode=0
 	FixedMode=1
 
 # issue #2
 class TrainingModes(object):
+	# The modes are copied: later changes of the caller's dict don't 
+	# affect the planner (use ImitPlanner.setTrainingModes)
 	def __init__ (self, trainingModes):
-		self.__tm=trainingModes
+		self.__tm={}
+		for subject in trainingModes:
+			self.__tm[subject]=[list(mode) 
+					for mode in trainingModes[subject]]
 	
 	def getGID(self,subj, intervalIndex):
 		if not self.isShared(subj, intervalIndex):
@@ -522,29 +1001,380 @@ class TrainingModes(object):
 		else:
 			return False
 
+# Training modes converted into per-interval arrays indexed by 
+# the position of the subject in the planner's subject list. 
+# Built once per run after input validation.
+class CompiledTrainingModes(object):
+	# Exact accounting: rates are approximated by fractions with 
+	# denominators not greater than this value
+	MAX_DENOMINATOR=10**6
+	
+	def __init__(self, trainingModes, subjectList, nIntervals,
+			accounting=ProgressAccounting.FLOAT):
+		tm=TrainingModes(trainingModes)
+		
+		# Input validation
+		for subject in subjectList:
+			# Check for the presence of all subjects OBJECT ID
+			# in trainingModes (issue #4)
+			if not tm.hasSubject(subject):
+				raise Exception("Error! All subjects must" 
+						+ " be in trainingModes as keys")
+			if tm.getNModesPerSubject(subject)!= \
+					tm.getNModesPerSubject(subjectList[0]):
+				raise Exception("Error! Each subject should have "
+					+ "the same number of training modes")
+		
+		nTrainingModes=tm.getNModesPerSubject(subjectList[0])
+		if nIntervals!=nTrainingModes:
+			raise Exception("Error! The number of training modes must"
+					+ " be 1 less than the number of milestones")
+		
+		if nTrainingModes<1:
+			raise Exception("Error! The number of training modes must "
+			+"be at least 1")
+		
+		self.__subjects=tuple(subjectList)
+		self.__perf=[]
+		self.__shared=[]
+		self.__GID=[]
+		self.__groups=[]
+		for i in range(0, nIntervals):
+			groups={}
+			for index in range(0, len(subjectList)):
+				subject=subjectList[index]
+				if tm.isShared(subject, i):
+					GID=tm.getGID(subject, i)
+					if GID not in groups:
+						groups[GID]=[]
+					groups[GID].append(index)
+			for GID in groups:
+				groups[GID]=tuple(groups[GID])
+			self.__perf.append(tuple(tm.getPerf(subject, i) 
+					for subject in subjectList))
+			self.__shared.append(tuple(tm.isShared(subject, i) 
+					for subject in subjectList))
+			self.__GID.append(tuple(tm.getGID(subject, i) 
+					for subject in subjectList))
+			self.__groups.append(groups)
+		
+		self.__accounting=accounting
+		self.__unitScale=1
+		self.__scaledPerf=self.__perf
+		if accounting==ProgressAccounting.EXACT:
+			self.__normalizeRates()
+	
+	# ProgressAccounting.EXACT
+	# 1 unit = unitScale sub-units. unitScale is the product of the 
+	# lcm of the denominators of all rates and totals of the sources 
+	# and the lcm of 1..(the size of the largest group), so every 
+	# scaled rate (and any sum of them) is divisible by the number 
+	# of the active subjects of a group: the shared performance is 
+	# divided without remainder
+	def __normalizeRates(self):
+		def lcm(a, b):
+			return a*b//math.gcd(a, b)
+		
+		rates=[]
+		unitScale=1
+		for perfArray in self.__perf:
+			rateArray=[]
+			for perf in perfArray:
+				rate=fractions.Fraction(perf).limit_denominator(
+						CompiledTrainingModes.MAX_DENOMINATOR)
+				unitScale=lcm(unitScale, rate.denominator)
+				rateArray.append(rate)
+			rates.append(rateArray)
+		for subject in self.__subjects:
+			for edSource in subject.getEdSources():
+				unitScale=lcm(unitScale, fractions.Fraction(
+						edSource.getNExTotal()).limit_denominator(
+						CompiledTrainingModes.MAX_DENOMINATOR)\
+						.denominator)
+		groupScale=1
+		for groups in self.__groups:
+			for GID in groups:
+				for n in range(2, len(groups[GID])+1):
+					groupScale=lcm(groupScale, n)
+		unitScale*=groupScale
+		
+		self.__unitScale=unitScale
+		self.__scaledPerf=[]
+		for rateArray in rates:
+			self.__scaledPerf.append(tuple(int(rate*unitScale) 
+					for rate in rateArray))
+	
+	def getAccounting(self):
+		return self.__accounting
+	
+	def getUnitScale(self):
+		return self.__unitScale
+	
+	# Performance in sub-units (ProgressAccounting.EXACT - integers,
+	# otherwise the same as getPerfArray)
+	def getScaledPerfArray(self, intervalIndex):
+		return self.__scaledPerf[intervalIndex]
+	
+	def getSubjects(self):
+		return self.__subjects
+	
+	def getNIntervals(self):
+		return len(self.__perf)
+	
+	# Arrays for the time interval (index - subject index)
+	def getPerfArray(self, intervalIndex):
+		return self.__perf[intervalIndex]
+	def getSharedArray(self, intervalIndex):
+		return self.__shared[intervalIndex]
+	def getGIDArray(self, intervalIndex):
+		return self.__GID[intervalIndex]
+	
+	# GID -> tuple of indices of subjects with shared performance
+	def getGroups(self, intervalIndex):
+		return self.__groups[intervalIndex]
+	
+	def getPerf(self, subjIndex, intervalIndex):
+		return self.__perf[intervalIndex][subjIndex]
+	def isShared(self, subjIndex, intervalIndex):
+		return self.__shared[intervalIndex][subjIndex]
+	def getGID(self, subjIndex, intervalIndex):
+		return self.__GID[intervalIndex][subjIndex]
+
 class ImitPlanner(IEventSource, IEventListener):
 	def __init__(self, trainingModes):
 		IEventSource.__init__(self)
 		self.__subjectList=[]
 		self.__trainingModes=TrainingModes(trainingModes)
 		self.__milestoneList = []
+		# Dependency index (startAfter): 
+		# previous subject -> list of dependent subjects
+		self.__dependents = {}
+		# Simulation state of locking: number of unfinished previous 
+		# subjects for locked subjects and the subjects which will be 
+		# unlocked on the next day
+		self.__nUnfinishedPrev = {}
 		self.__subjUnlockList = []
+		self.__accounting = ProgressAccounting.FLOAT
+		self.__compiledModes = None
+		# Actual progress: (date, {item: progress}) or None
+		self.__progress = None
+		# Checkpoints for re-planning (see enableCheckpoints)
+		self.__fCheckpoints = False
+		self.__checkpointNDays = None
+		self.__clearCheckpoints()
+		# Daily progress of the last simulation (see 
+		# enableProgressTrace)
+		self.__fTrace = False
+		self.__trace = None
+		# Key dates of the current run for PlanResult 
+		# (date, dateType, fEnd, payload) or None
+		self.__resultLog = None
+		# Has the state of the model been changed by the simulation?
+		self.__fDirty = False
 
+	def getSubjects(self):
+		# protection from changes
+		return tuple(self.__subjectList)
+	
+	def getMilestones(self):
+		# protection from changes
+		return tuple(self.__milestoneList)
+	
+	# The planner keeps its own copy of the training modes, 
+	# the compiled modes are cached until the next change
+	def setTrainingModes(self, trainingModes):
+		self.__trainingModes=TrainingModes(trainingModes)
+		self.__compiledModes=None
+		self.__clearCheckpoints()
+	
+	def setProgressAccounting(self, accounting):
+		self.__accounting=accounting
+		self.__compiledModes=None
+		self.__clearCheckpoints()
+	
+	def getProgressAccounting(self):
+		return self.__accounting
+	
 	def addSubject(self, subject):
 		self.__subjectList.append(subject)
-		subject.addEventListener(self)
+		self.__indexDependencies(subject)
+		self.__compiledModes=None
+		self.__clearCheckpoints()
+	
+	def __indexDependencies(self, subject):
+		for prevSubj in subject.getPrevSubjects():
+			if prevSubj not in self.__dependents:
+				self.__dependents[prevSubj]=[]
+			self.__dependents[prevSubj].append(subject)
+	
+	# Cycles in startAfter dependencies (the subjects would never 
+	# be unlocked)
+	def __checkDependencies(self):
+		# subject -> False (in progress), True (checked)
+		visited={}
+		for subject in self.__subjectList:
+			if subject in visited:
+				continue
+			visited[subject]=False
+			# depth-first search (iterative)
+			stack=[(subject, iter(subject.getPrevSubjects()))]
+			while len(stack)>0:
+				subj, prevSubjects = stack[-1]
+				prevSubj=next(prevSubjects, None)
+				if prevSubj==None:
+					visited[subj]=True
+					stack.pop()
+				elif prevSubj not in visited:
+					visited[prevSubj]=False
+					stack.append((prevSubj, 
+							iter(prevSubj.getPrevSubjects())))
+				elif visited[prevSubj]==False:
+					raise Exception("Error! Cyclic startAfter "
+							+ "dependency: " + prevSubj.getDescr())
 	
 	# issue #7
-	def __addSubjToUnlockList(self, subject):
-		self.__subjUnlockList.append(subject)
-
+	# Initial state of locking (after reset or restoring of the state)
+	def __initUnlockState(self):
+		self.__nUnfinishedPrev={}
+		self.__subjUnlockList=[]
+		for subject in self.__subjectList:
+			if subject.isLocked():
+				nUnfinished=0
+				for prevSubj in subject.getPrevSubjects():
+					if not prevSubj.isFinished():
+						nUnfinished+=1
+				self.__nUnfinishedPrev[subject]=nUnfinished
+				if nUnfinished==0:
+					self.__subjUnlockList.append(subject)
+	
+	# issue #7
+	# The subject has been completed today: its dependent subjects 
+	# whose previous subjects are all completed will be unlocked
+	# on the next day
+	def __onSubjectFinished(self, subject):
+		for dependent in self.__dependents.get(subject, ()):
+			if dependent in self.__nUnfinishedPrev:
+				self.__nUnfinishedPrev[dependent]-=1
+				if self.__nUnfinishedPrev[dependent]==0:
+					self.__subjUnlockList.append(dependent)
+	
 	# issue #7
 	def __unlockSubjFromUnlockList(self):
 		for subject in self.__subjUnlockList:
 			subject.unlock()
+			del self.__nUnfinishedPrev[subject]
+		self.__subjUnlockList=[]
+	
+	# Lazy payloads: the planner subscribes only to those events 
+	# from subjects that are needed to generate key dates 
+	# for its own listeners. Otherwise subjects don't build events.
+	def __subscribeToSubjects(self):
+		handlers=self.getEventHandlers()
+		messages=[]
+		# checkpoints or PlanResult
+		fLog=self.__keyDateLog!=None or self.__resultLog!=None
+		if fLog or self.hasEventHandlers("KeyDate", DateType.ED_SOURCE):
+			messages+=["Source completed!", "Source started!"]
+		if fLog or self.hasEventHandlers("KeyDate", DateType.SUBJECT):
+			messages+=["Subject completed!", "Subject started!"]
+		for subject in self.__subjectList:
+			subject.removeEventListener(self)
+			for message in messages:
+				subject.subscribe(message, handlers[message], self)
 		
+	# Snapshot of the simulation state of all subjects
+	def saveState(self):
+		subjStates=[]
+		for subject in self.__subjectList:
+			subjStates.append(subject.getState())
+		return (tuple(subjStates), self.__fDirty)
+	
+	def restoreState(self, state):
+		subjStates, self.__fDirty = state
+		for i in range(0, len(self.__subjectList)):
+			self.__subjectList[i].setState(subjStates[i])
+	
+	# Return all subjects and sources to the initial state.
+	# genKeyDates does it automatically before the repeated run.
+	def reset(self):
+		for subject in self.__subjectList:
+			subject.reset()
+		self.__fDirty=False
+	
 	def addMilestone(self, milestone):
 		self.__milestoneList.append(milestone)
+		self.__compiledModes=None
+		self.__clearCheckpoints()
+	
+	# Actual progress as of the date:
+	#   {edSource: the number of units done (days for FixedTimeTask),
+	#    subject: True (the subject is completed)}
+	# Subjects whose study has begun or whose previous subjects are 
+	# completed are unlocked. The simulation starts from this date 
+	# (key dates before it are not generated), until clearProgress.
+	def loadProgress(self, date, progress):
+		self.__checkMilestoneListLength()
+		if date<self.__milestoneList[0].getDate() or \
+				date>self.__milestoneList[-1].getDate():
+			raise Exception("Error! The date must be between the first"
+					+ " and the last milestones!")
+		items=set(self.__getItems())
+		for item in progress:
+			if item not in items:
+				raise Exception("Error! No such subject or ed. source"
+						+ " in the planner!")
+		self.__progress=(date, dict(progress))
+		self.__fDirty=True
+		self.__clearCheckpoints()
+	
+	def clearProgress(self):
+		self.__progress=None
+		self.__fDirty=True
+		self.__clearCheckpoints()
+	
+	# The date of the loaded progress (or None)
+	def getProgressDate(self):
+		if self.__progress==None:
+			return None
+		return self.__progress[0]
+	
+	# Returns msCounter for the date of the loaded progress
+	def __applyProgress(self):
+		date, progress = self.__progress
+		for subject in self.__subjectList:
+			subject.loadProgress(progress)
+		for subject in self.__subjectList:
+			if subject.isLocked():
+				subject.unlock()
+		self.__curDate=date
+		msCounter=0
+		while self.__milestoneList[msCounter].getDate()<date:
+			msCounter+=1
+		return msCounter
+	
+	# Key dates before the simulation from the date of the progress:
+	# the previous milestones and (verbose mode) the start of the 
+	# subjects and the sources in progress on this date
+	def __fireProgressKeyDates(self, verbose, msCounter):
+		for milestone in self.__milestoneList[:msCounter]:
+			self.__fireKeyDate(DateType.MILESTONE, None, milestone,
+					milestone.getDate())
+		if verbose:
+			for subject in self.__subjectList:
+				subject.fireProgressStarted()
+	
+	# End date of the subject or the ed. source in the last 
+	# simulation. Items completed before the date of the loaded 
+	# progress end on the previous day.
+	def __getEndDate(self, collector, item):
+		endDate=collector.getEndDate(item)
+		if endDate==None and self.__progress!=None:
+			if (isinstance(item, Subject) and item.isFinished()) or \
+					(isinstance(item, AbstractEdSource) and 
+						item.isComplete()):
+				endDate=max(self.__milestoneList[0].getDate(), 
+						self.__progress[0]-datetime.timedelta(days=1))
+		return endDate
 	
 	def __checkMilestoneListLength(self):
 		if len(self.__milestoneList)<2:
@@ -586,50 +1416,173 @@ class ImitPlanner(IEventSource, IEventListener):
 			n+=subject.getNExTotal()
 		return n
 	
-	def __inputValidation(self):
-		# Input validation
+	# Input validation and conversion of training modes into arrays.
+	# The result is reused until subjects or milestones are added.
+	def compile(self):
+		if self.__compiledModes==None:
+			self.__checkMilestoneListLength()
+			self.__checkSubjListLength()
+			self.__checkDependencies()
+			self.__compiledModes=CompiledTrainingModes(
+					self.__trainingModes.getModes(), self.__subjectList,
+					len(self.__milestoneList)-1, self.__accounting)
+		return self.__compiledModes
+	
+	# Daily performance for each subject.
+	# Returns a list of (subject, performance) pairs in the order 
+	# in which they are processed within a day: subjects with 
+	# a fixed performance first, then subjects with shared performance.
+	def __calcDailyPerf(self, compiledModes, intervalIndex):
 		
-		self.__checkMilestoneListLength()
-		self.__checkSubjListLength()
+		# Studying objects with shared ed. performance 
+		# (second value - 0). If the study of one of these subjects 
+		# is completed, then the released resources are 
+		# redistributed to the remaining subjects.
+		# It is assumed that the complexity of the tasks 
+		# is approximately the same
 		
-		fFirstValue=True
-		nTrainingModes=0
-		for subject in self.__subjectList:
-			
-			# Check for the presence of all subjects OBJECT ID
-			# in trainingModes (issue #4)
-			if not self.__trainingModes.hasSubject(subject):
-				raise Exception("Error! All subjects must" 
-						+ " be in trainingModes as keys")
-			
-			if fFirstValue==True:
-				nTrainingModes= \
-					self.__trainingModes.getNModesPerSubject(subject)
-			else:
-				if self.__trainingModes.getNModesPerSubject(subject)!= \
-						nTrainingModes:
-					raise Exception("Error! Each subject should have "
-						+ "the same number of training modes")
+		perfArray=compiledModes.getScaledPerfArray(intervalIndex)
+		sharedArray=compiledModes.getSharedArray(intervalIndex)
+		fExact=compiledModes.getAccounting()==ProgressAccounting.EXACT
 		
-		if len(self.__milestoneList)!=nTrainingModes+1:
-			raise Exception("Error! The number of training modes must"
-					+ " be 1 less than the number of milestones")
+		outputList=[]
 		
-		if nTrainingModes<1:
-			raise Exception("Error! The number of training modes must "
-			+"be at least 1")
-		return 0
+		# Processing subjects with a fixed performance
+		# When their study is completed, the released 
+		# resources are not redistributed 
+		# in favor of other subjects.
+		for index in range(0, len(self.__subjectList)):
+			subject=self.__subjectList[index]
+			if (not sharedArray[index] or subject.isLocked()) \
+					and subject.isFullyComplete()==False:
+				outputList.append((subject, perfArray[index]))
+		
+		# Calculation of resource reallocation for items with 
+		# shared training performance (per GID)
+		groups=compiledModes.getGroups(intervalIndex)
+		if len(groups)>0:
+			perfPerSubject=[None]*len(self.__subjectList)
+			for GID in groups:
+				# Available performance and number of subjects
+				sharedPerformance=0
+				nSharedSubjects=0
+				for index in groups[GID]:
+					subject=self.__subjectList[index]
+					if subject.isLocked()==False:
+						sharedPerformance+=perfArray[index]
+						if subject.isFullyComplete()==False:
+							nSharedSubjects+=1
+				if nSharedSubjects>0:
+					if fExact and sharedPerformance%nSharedSubjects!=0:
+						raise Exception("Error! Shared performance can't"
+								+ " be divided exactly!")
+					for index in groups[GID]:
+						perfPerSubject[index]= \
+							sharedPerformance//nSharedSubjects if fExact \
+							else sharedPerformance/nSharedSubjects
+			
+			for index in range(0, len(self.__subjectList)):
+				subject=self.__subjectList[index]
+				if sharedArray[index] and subject.isLocked()==False \
+						and subject.isFullyComplete()==False:
+					outputList.append((subject, perfPerSubject[index]))
+		
+		return outputList
 	
-	def __add2Dict(self,dictionary, key, value):
-		if key not in dictionary:
-			dictionary[key]=0
-		dictionary[key]+= value
+	# Next-event engine
+	# The number of days starting from the current one during which 
+	# no key dates are generated (nothing is completed or started) 
+	def __calcNQuietDays(self, dailyPerfList, nDaysMax, verbose):
+		nQuietDays=nDaysMax
+		for subject, perf in dailyPerfList:
+			if subject.isLocked() or perf<=0:
+				continue
+			if verbose and not subject.isUsed():
+				return 0
+			nQuietDays=min(nQuietDays, 
+					subject.getNDaysToSourceCompletion(perf, 
+						nQuietDays)-1)
+			if nQuietDays<=0:
+				return 0
+		return nQuietDays
 		
 	# The function generates key dates by simulation. 
 	# Returns true if there is enough time to study all subjects.
-	def genKeyDates(self, verbose=False):
+	# SimulationEngine.NEXT_EVENT engine skips the days on which 
+	# nothing happens and produces the same key dates.
+	# If perfDistribution is set, the daily output of each subject is 
+	# drawn from it using random generator rnd (stochastic mode, 
+	# only SimulationEngine.DAY_STEP)
+	# fResult - return PlanResult instead of the success flag
+	def genKeyDates(self, verbose=False, 
+			engine=SimulationEngine.DAY_STEP, perfDistribution=None,
+			rnd=None, fResult=False):
+		if fResult:
+			self.__resultLog=[]
+		try:
+			for step in self.__simulate(verbose, engine, 
+					perfDistribution, rnd):
+				pass
+			if fResult:
+				return self.__makePlanResult(verbose)
+		finally:
+			self.__resultLog=None
+		return self.__isSuccess()
+	
+	def __makePlanResult(self, verbose):
+		unfinishedSourcesStat=[]
+		for subj in self.__subjectList:
+			stat = subj.getUnfinishedSourcesStat()
+			if stat!=():
+				unfinishedSourcesStat.append((subj, stat))
+		return PlanResult(self.__isSuccess(), self.__resultLog,
+				tuple(unfinishedSourcesStat), 
+				self.__makeTimeIntervals(), verbose)
+	
+	# Streaming variant of genKeyDates: yields key dates (KeyDate) 
+	# while the simulation advances. The simulation stops if the 
+	# iteration is stopped. Listeners of the planner receive 
+	# the events as usual.
+	def iterKeyDates(self, verbose=False, 
+			engine=SimulationEngine.DAY_STEP, perfDistribution=None,
+			rnd=None):
+		keyDates=collections.deque()
+		self.subscribe("KeyDate", 
+				lambda event: keyDates.append(event.getPayload()), 
+				keyDates)
+		try:
+			for step in self.__simulate(verbose, engine, 
+					perfDistribution, rnd):
+				while len(keyDates)>0:
+					yield keyDates.popleft()
+		finally:
+			self.removeEventListener(keyDates)
+	
+	# Verification of successful completion of training
+	def __isSuccess(self):
+		fSuccess=True
+		for subject in self.__subjectList:
+			if subject.isFinished()==False:
+				fSuccess=False
+		return fSuccess
+	
+	# Simulation as a generator: one step per simulated day 
+	# (or per jump of the next-event engine)
+	# The simulation continues from the checkpoint if it is set
+	def __simulate(self, verbose, engine, perfDistribution, rnd, 
+			checkpoint=None):
 		
-		self.__inputValidation()
+		compiledModes=self.compile()
+		
+		if perfDistribution!=None:
+			if engine!=SimulationEngine.DAY_STEP:
+				raise Exception("Error! Stochastic mode requires "
+						+ "SimulationEngine.DAY_STEP engine!")
+			if rnd==None:
+				rnd=random.Random()
+			if compiledModes.getAccounting()==ProgressAccounting.EXACT:
+				raise Exception("Error! Stochastic mode requires "
+						+ "ProgressAccounting.FLOAT!")
 		
 		# startDate & endDate calculation
 		startDate = self.__milestoneList[0].getDate()
@@ -637,7 +1590,8 @@ class ImitPlanner(IEventSource, IEventListener):
 			self.__milestoneList[len(self.__milestoneList)-1].getDate())
 			
 		# sending verbose flag information (issue #3)
-		self.fireEvent(Event("fVerbose",verbose))
+		if self.hasEventHandlers("fVerbose"):
+			self.fireEvent(Event("fVerbose",verbose))
 		
 		# Current date & msCounter initialization	
 		self.__refreshCurDate()
@@ -645,16 +1599,35 @@ class ImitPlanner(IEventSource, IEventListener):
 		
 		if len(self.__trainingModes.getModes())==0:
 			raise Exception("Error! Training mode list is empty!")
+		
+		for subject in self.__subjectList:
+			subject.setUnitScale(compiledModes.getUnitScale())
+		if checkpoint==None:
+			# Repeated run
+			if self.__fDirty:
+				self.reset()
+			self.__fDirty=True
+			if self.__progress!=None:
+				msCounter=self.__applyProgress()
+			self.__initUnlockState()
+			self.__startCheckpoints(verbose, engine, perfDistribution)
+		else:
+			msCounter=self.__restoreCheckpoint(checkpoint)
+		self.__startTrace(checkpoint, endDate)
+		
+		self.__subscribeToSubjects()
+		if checkpoint==None and self.__progress!=None:
+			self.__fireProgressKeyDates(verbose, msCounter)
 			
 		while self.__getCurDate()<=endDate:
+			self.__recordCheckpoint(msCounter)
+			
 			# Milestone processing
 			if (self.__getCurDate() 
 					== self.__milestoneList[msCounter].getDate()):
 				msCounter+=1
-				self.fireEvent(Event("KeyDate",
-						KeyDate(self.__getCurDate(),
-						DateType.MILESTONE, None,
-						self.__milestoneList[msCounter-1])))
+				self.__fireKeyDate(DateType.MILESTONE, None,
+						self.__milestoneList[msCounter-1])
 			if msCounter==len(self.__milestoneList):
 				break
 			
@@ -664,134 +1637,1663 @@ class ImitPlanner(IEventSource, IEventListener):
 			
 			self.__unlockSubjFromUnlockList()
 			
-			# Studying objects with shared ed. performance 
-			# (second value - 0). If the study of one of these subjects 
-			# is completed, then the released resources are 
-			# redistributed to the remaining subjects.
-			# It is assumed that the complexity of the tasks 
-			# is approximately the same
+			dailyPerfList = self.__calcDailyPerf(compiledModes, 
+					msCounter-1)
 			
-			# Number of subjects with shared performance per GID
-			nSharedSubjects={} # issue 2: dict instead of int
+			if engine==SimulationEngine.NEXT_EVENT:
+				# Jump to the day of the next key date
+				nDaysMax = (self.__milestoneList[msCounter].getDate()
+						- self.__getCurDate()).days
+				nQuietDays = self.__calcNQuietDays(dailyPerfList,
+						nDaysMax, verbose)
+				if nQuietDays>0:
+					for subject, perf in dailyPerfList:
+						if subject.isLocked()==False and perf>0:
+							subject.fastForward(perf, nQuietDays)
+					if self.__trace!=None:
+						self.__trace.record(nQuietDays)
+					self.__curDate+=datetime.timedelta(days=nQuietDays)
+					continue
 			
-			# Available performance per GID
-			sharedPerformance={} # issue 2: dict instead of int
+			for subject, perf in dailyPerfList:
+				if perfDistribution!=None and perf>0:
+					perf=perfDistribution.sample(rnd, perf)
+				fFinished=subject.isFinished()
+				subject.solveEx(perf, verbose)
+				if not fFinished and subject.isFinished():
+					self.__onSubjectFinished(subject)
 			
-			# Calculation of nSharedSubjects and sharedPerfomance values
-			for subject in self.__subjectList:
-				if self.__trainingModes.isShared(subject,
-						msCounter-1) \
-					and subject.isLocked()==False:
-					
-					self.__add2Dict(sharedPerformance, 
-							self.__trainingModes.getGID(subject, 
-								msCounter-1), 
-							self.__trainingModes.getPerf(	
-								subject,msCounter-1))
-					
-					if subject.isFullyComplete()==False:
-						self.__add2Dict(nSharedSubjects, 
-							self.__trainingModes.getGID(subject, 
-								msCounter-1), 1)
-				else:
-					# Processing subjects with a fixed performance
-					# When their study is completed, the released 
-					# resources are not redistributed 
-					# in favor of other subjects.
-					if subject.isFullyComplete()==False:
-						subject.solveEx(
-						self.__trainingModes.getPerf(subject,
-								msCounter-1),
-								verbose)
-					
-			if len(nSharedSubjects)>0:
-				# Calculation of resource reallocation for items with 
-				# shared training performance
-				performancePerSubjPerGID={} #issue #2
-				for GID in nSharedSubjects:
-					
-					performancePerSubjPerGID[GID]= \
-						sharedPerformance[GID]/nSharedSubjects[GID]
-				
-				for subject in self.__subjectList:
-					if self.__trainingModes.isShared(subject, \
-						msCounter-1) and subject.isFullyComplete()==False \
-						and subject.isLocked()==False:
-							GID = self.__trainingModes.getGID(subject, 
-									msCounter-1)
-							subject.solveEx(
-									performancePerSubjPerGID[GID],
-										verbose)
+			if self.__trace!=None:
+				self.__trace.record()
 			
 			# Cycle step
 			self.__incCurDate()
+			yield
 		
 		# unfinished tasks statistics (issue #14)
-		outputList=[]
-		for subj in self.__subjectList:
-			stat = subj.getUnfinishedSourcesStat()
-			if stat!=():
-				outputList.append((subj, stat))
-		self.fireEvent(Event("UnfinishedSourcesStat", 
-		tuple(outputList)))
-		
-		del outputList
+		if self.hasEventHandlers("UnfinishedSourcesStat"):
+			outputList=[]
+			for subj in self.__subjectList:
+				stat = subj.getUnfinishedSourcesStat()
+				if stat!=():
+					outputList.append((subj, stat))
+			self.fireEvent(Event("UnfinishedSourcesStat", 
+			tuple(outputList)))
+			
+			del outputList
 		
-				
-		# Verification of successful completion of training
-		fSuccess=True
-		for subject in self.__subjectList:
-			if subject.isFinished()==False:
-				fSuccess=False
-		return fSuccess
-					
-	def onEvent(self, event):
-		if event.getMessage()=="Source completed!":
-			self.fireEvent(Event("KeyDate", 
-					KeyDate(self.__getCurDate(), DateType.ED_SOURCE,
-							True, event.getPayload() )))
-		elif event.getMessage()=="Subject completed!":
-			self.fireEvent(Event("KeyDate", 
-					KeyDate(self.__getCurDate(), DateType.SUBJECT,
-							True, event.getPayload() )))
-			# issue 7
-			for subject in self.__subjectList:
-				if subject.getPrevSubject()==event.getPayload():
-					self.__addSubjToUnlockList(subject)
-					
+		# The last step (key dates of the last milestone)
+		yield
 					
-		elif event.getMessage()=="Source started!": #issue 5
-			self.fireEvent(Event("KeyDate", 
-					KeyDate(self.__getCurDate(), DateType.ED_SOURCE,
-							False, event.getPayload() )))
-		elif event.getMessage()=="Subject started!":
-			self.fireEvent(Event("KeyDate", 
-					KeyDate(self.__getCurDate(), DateType.SUBJECT,
-						False, event.getPayload() )))
+	# Progress trace: the simulation records the progress of all 
+	# subjects and ed. sources at the end of each day 
+	# (see ProgressTrace, getProgressTrace)
+	def enableProgressTrace(self):
+		self.__fTrace=True
 	
-	def genTimeIntDescrRecords(self):
-		self.__inputValidation()
-		for i in range(0, len(self.__milestoneList)-1):
-			interval = TimeInterval(self.__milestoneList[i],
-					self.__milestoneList[i+1])
-			for subject in self.__subjectList:
-				if self.__trainingModes.isShared(subject,i):
-					
-					GID = self.__trainingModes.getGID(subject, i)
-					interval.addSharedPerfSubjRecord(GID,
-						TimeIntervalDescrRecord(subject, 
-							self.__trainingModes.getPerf(subject,i)))
-				else:
+	def disableProgressTrace(self):
+		self.__fTrace=False
+		self.__trace=None
+	
+	# ProgressTrace of the last simulation (or None)
+	def getProgressTrace(self):
+		return self.__trace
+	
+	def __startTrace(self, checkpoint, endDate):
+		if not self.__fTrace:
+			self.__trace=None
+		elif checkpoint!=None and self.__trace!=None:
+			# Days before the checkpoint are taken from the trace 
+			# of the previous simulation
+			self.__trace=ProgressTrace(self.__trace.getStartDate(),
+					(endDate-self.__trace.getStartDate()).days, 
+					self.__subjectList, self.__trace, 
+					self.__getCurDate())
+		else:
+			self.__trace=ProgressTrace(self.__getCurDate(),
+					(endDate-self.__getCurDate()).days, 
+					self.__subjectList)
+	
+	# Checkpoints for re-planning. During genKeyDates (without 
+	# perfDistribution) the state of the model is saved at each 
+	# milestone and, if nDays is set, every nDays days. The replan* 
+	# methods continue the simulation from the latest checkpoint 
+	# which is not affected by the change.
+	def enableCheckpoints(self, nDays=None):
+		if nDays!=None and nDays<1:
+			raise Exception("Error! nDays must be at least 1!")
+		self.__fCheckpoints=True
+		self.__checkpointNDays=nDays
+	
+	def disableCheckpoints(self):
+		self.__fCheckpoints=False
+		self.__clearCheckpoints()
+	
+	def __clearCheckpoints(self):
+		self.__checkpoints=None
+		self.__keyDateLog=None
+		self.__checkpointRunParams=None
+		self.__nextCheckpointDate=None
+	
+	def __getCheckpointData(self):
+		return (self.__checkpoints, self.__keyDateLog, 
+				self.__checkpointRunParams, self.__nextCheckpointDate)
+	
+	def __setCheckpointData(self, checkpointData):
+		self.__checkpoints, self.__keyDateLog, \
+			self.__checkpointRunParams, self.__nextCheckpointDate = \
+			checkpointData
+	
+	def __startCheckpoints(self, verbose, engine, perfDistribution):
+		if self.__fCheckpoints and perfDistribution==None:
+			self.__checkpoints=[]
+			# (date, dateType, fEnd, payload)
+			self.__keyDateLog=[]
+			self.__checkpointRunParams=(verbose, engine)
+			self.__nextCheckpointDate=self.__getCurDate()
+		else:
+			self.__clearCheckpoints()
+	
+	# At the beginning of the day (before the milestone processing)
+	def __recordCheckpoint(self, msCounter):
+		if self.__checkpoints==None:
+			return
+		curDate=self.__getCurDate()
+		fMilestone=msCounter<len(self.__milestoneList) and \
+				curDate==self.__milestoneList[msCounter].getDate()
+		fDay=self.__checkpointNDays!=None and \
+				curDate>=self.__nextCheckpointDate
+		if fMilestone or fDay:
+			self.__checkpoints.append((curDate, msCounter, 
+					self.saveState(), dict(self.__nUnfinishedPrev),
+					tuple(self.__subjUnlockList)))
+			if self.__checkpointNDays!=None:
+				self.__nextCheckpointDate=curDate+datetime.timedelta(
+						days=self.__checkpointNDays)
+	
+	# Returns msCounter
+	def __restoreCheckpoint(self, checkpoint):
+		date, msCounter, state, nUnfinishedPrev, subjUnlockList = \
+				checkpoint
+		self.restoreState(state)
+		self.__nUnfinishedPrev=dict(nUnfinishedPrev)
+		self.__subjUnlockList=list(subjUnlockList)
+		self.__curDate=date
+		
+		# The checkpoint and the key dates from its date 
+		# are recorded again
+		checkpoints=[]
+		for cp in self.__checkpoints:
+			if cp[0]<date:
+				checkpoints.append(cp)
+		self.__checkpoints=checkpoints
+		keyDateLog=[]
+		for record in self.__keyDateLog:
+			if record[0]<date:
+				keyDateLog.append(record)
+		self.__keyDateLog=keyDateLog
+		self.__nextCheckpointDate=date
+		return msCounter
+	
+	# Re-planning: the simulation continues from the latest 
+	# checkpoint recorded not later than changeDate (from the 
+	# beginning if changeDate is None). Returns the key dates that 
+	# moved: tuple of (old KeyDate, new KeyDate) pairs, None if 
+	# the key date is absent in the old or in the new plan.
+	# Listeners receive the events of the re-simulated days only.
+	def __replan(self, changeDate, applyChange):
+		if self.__checkpoints==None:
+			raise Exception("Error! There are no checkpoints. Call "
+					+ "enableCheckpoints and genKeyDates first!")
+		oldKeyDateLog=self.__keyDateLog
+		verbose, engine = self.__checkpointRunParams
+		
+		checkpoint=None
+		if changeDate!=None:
+			for cp in self.__checkpoints:
+				if cp[0]<=changeDate:
+					checkpoint=cp
+		
+		applyChange()
+		for step in self.__simulate(verbose, engine, None, None, 
+				checkpoint):
+			pass
+		return self.__diffKeyDateLogs(oldKeyDateLog, self.__keyDateLog)
+	
+	def __diffKeyDateLogs(self, oldKeyDateLog, newKeyDateLog):
+		def makeDict(keyDateLog):
+			d={}
+			for date, dateType, fEnd, payload in keyDateLog:
+				item=payload
+				if dateType==DateType.ED_SOURCE:
+					item=payload.getEdSource()
+				d[(dateType, fEnd, item)]=KeyDate(date, dateType, fEnd,
+						payload)
+			return d
+		
+		oldKeyDates=makeDict(oldKeyDateLog)
+		newKeyDates=makeDict(newKeyDateLog)
+		moved=[]
+		for key in newKeyDates:
+			oldKeyDate=oldKeyDates.get(key)
+			if oldKeyDate==None or oldKeyDate.getDate()!= \
+					newKeyDates[key].getDate():
+				moved.append((oldKeyDate, newKeyDates[key]))
+		for key in oldKeyDates:
+			if key not in newKeyDates:
+				moved.append((oldKeyDates[key], None))
+		
+		def getSortKey(pair):
+			oldKeyDate, newKeyDate = pair
+			if newKeyDate!=None:
+				return newKeyDate.getDate()
+			return oldKeyDate.getDate()
+		moved.sort(key=getSortKey)
+		return tuple(moved)
+	
+	# The first date of the interval (index) or None
+	def __getIntervalStartDate(self, intervalIndex):
+		if intervalIndex==None:
+			return None
+		return self.__milestoneList[intervalIndex].getDate()
+	
+	# Re-planning with new training modes. The simulation continues 
+	# from the first interval in which the modes are changed.
+	def replanTrainingModes(self, trainingModes):
+		oldModes=self.compile()
+		newTrainingModes=TrainingModes(trainingModes)
+		newModes=CompiledTrainingModes(newTrainingModes.getModes(), 
+				self.__subjectList, len(self.__milestoneList)-1,
+				self.__accounting)
+		
+		changedInterval=None
+		changeDate=None # the new unit scale: from the beginning
+		if oldModes.getUnitScale()==newModes.getUnitScale():
+			for i in range(0, oldModes.getNIntervals()):
+				if oldModes.getPerfArray(i)!=newModes.getPerfArray(i) \
+						or oldModes.getSharedArray(i)!= \
+							newModes.getSharedArray(i) \
+						or oldModes.getGIDArray(i)!= \
+							newModes.getGIDArray(i):
+					changedInterval=i
+					break
+			if changedInterval==None:
+				# nothing is changed
+				changedInterval=oldModes.getNIntervals()
+			changeDate=self.__getIntervalStartDate(changedInterval)
+		
+		def applyChange():
+			self.__trainingModes=newTrainingModes
+			self.__compiledModes=newModes
+		
+		return self.__replan(changeDate, applyChange)
+	
+	# Re-planning with the new date of the milestone (except 
+	# the first one). The order of milestones must be preserved.
+	def replanMilestone(self, milestone, date):
+		if milestone not in self.__milestoneList:
+			raise Exception("Error! No such milestone!")
+		index=self.__milestoneList.index(milestone)
+		if index>0 and \
+				date<=self.__milestoneList[index-1].getDate():
+			raise Exception("Error! Milestone dates must increase")
+		if index<len(self.__milestoneList)-1 and \
+				date>=self.__milestoneList[index+1].getDate():
+			raise Exception("Error! Milestone dates must increase")
+		
+		changeDate=min(date, milestone.getDate())
+		if index==0:
+			changeDate=None
+		
+		def applyChange():
+			milestone.setDate(date)
+		
+		return self.__replan(changeDate, applyChange)
+	
+	# Re-planning with the new size of the ed. source 
+	# (nExTotal or the number of days of FixedTimeTask). 
+	# The simulation continues from the day on which the source 
+	# was started.
+	def replanSourceSize(self, edSource, size):
+		subject=None
+		for subj in self.__subjectList:
+			if edSource in subj.getEdSources():
+				subject=subj
+		if subject==None:
+			raise Exception("Error! No such ed. source!")
+		
+		def applyChange():
+			if isinstance(edSource, FixedTimeTask):
+				edSource.setNDays(size)
+			else:
+				edSource.setNExTotal(size)
+			self.__compiledModes=None
+		
+		changeDate=self.__findSourceStartDate(subject, edSource)
+		if self.__accounting==ProgressAccounting.EXACT and \
+				not isinstance(edSource, FixedTimeTask):
+			# the unit scale depends on the sizes of sources
+			unitScale=self.compile().getUnitScale()
+			nExTotal=edSource.getNExTotal()
+			edSource.setNExTotal(size)
+			self.__compiledModes=None
+			if self.compile().getUnitScale()!=unitScale:
+				changeDate=None
+			edSource.setNExTotal(nExTotal)
+			self.__compiledModes=None
+		
+		return self.__replan(changeDate, applyChange)
+	
+	# The day on which the source was started in the last simulation
+	# (the last checkpoint date if it wasn't started)
+	def __findSourceStartDate(self, subject, edSource):
+		if self.__checkpoints==None:
+			return None
+		endDates={}
+		startDates={}
+		for date, dateType, fEnd, payload in self.__keyDateLog:
+			item=payload
+			if dateType==DateType.ED_SOURCE:
+				item=payload.getEdSource()
+			if fEnd:
+				endDates[item]=date
+			else:
+				startDates[item]=date
+		neverDate=self.__checkpoints[-1][0]
+		
+		edSources=subject.getEdSources()
+		index=edSources.index(edSource)
+		if edSource in startDates:
+			return startDates[edSource]
+		if index>0:
+			# the source is started on the day on which 
+			# the previous one is completed
+			return endDates.get(edSources[index-1], neverDate)
+		if subject in startDates:
+			return startDates[subject]
+		if self.__checkpointRunParams[0]:
+			# verbose: the subject was not started
+			return neverDate
+		# The subject may be started on the day after its previous 
+		# subjects are completed
+		startDate=self.__milestoneList[0].getDate()
+		for prevSubj in subject.getPrevSubjects():
+			if prevSubj not in endDates:
+				return neverDate
+			startDate=max(startDate, 
+					endDates[prevSubj]+datetime.timedelta(days=1))
+		return startDate
+	
+	# Simulation with the given training modes. Returns compact 
+	# ScenarioResult without references to the model objects
+	def runScenario(self, trainingModes=None, 
+			engine=SimulationEngine.NEXT_EVENT):
+		if trainingModes!=None:
+			self.setTrainingModes(trainingModes)
+		collector=KeyDateCollector()
+		self.addEventListener(collector)
+		try:
+			fSuccess=self.genKeyDates(engine=engine)
+		finally:
+			self.removeEventListener(collector)
+		
+		subjEndDates=[]
+		sourceEndDates=[]
+		sourceIndices={}
+		for subjIndex in range(0, len(self.__subjectList)):
+			subject=self.__subjectList[subjIndex]
+			subjEndDates.append(self.__getEndDate(collector, subject))
+			edSources=subject.getEdSources()
+			dates=[]
+			for sourceIndex in range(0, len(edSources)):
+				sourceIndices[edSources[sourceIndex]]= \
+					(subjIndex, sourceIndex)
+				dates.append(self.__getEndDate(collector, 
+						edSources[sourceIndex]))
+			sourceEndDates.append(tuple(dates))
+		
+		unfinishedSourcesStat=[]
+		for subject, stat in collector.getUnfinishedSourcesStat():
+			for edSource, descr in stat:
+				subjIndex, sourceIndex = sourceIndices[edSource]
+				unfinishedSourcesStat.append((subjIndex, sourceIndex, 
+						descr))
+		
+		return ScenarioResult(fSuccess, tuple(subjEndDates),
+				tuple(sourceEndDates), tuple(unfinishedSourcesStat))
+	
+	# Simulation of the same model with many variants of training 
+	# modes in worker processes. Each worker has its own copy of 
+	# the model. Returns a tuple of ScenarioResult objects in the 
+	# order of variants.
+	def sweepTrainingModes(self, variants, nWorkers=None,
+			engine=SimulationEngine.NEXT_EVENT):
+		self.compile() # input validation
+		
+		# Training modes are sent to workers as lists 
+		# in the order of subjects
+		modesLists=[]
+		for trainingModes in variants:
+			modesList=[]
+			for subject in self.__subjectList:
+				if subject not in trainingModes:
+					raise Exception("Error! All subjects must" 
+						+ " be in trainingModes as keys")
+				modesList.append(trainingModes[subject])
+			modesLists.append(modesList)
+		
+		model=self.__copyModel()
+		model.reset()
+		
+		if nWorkers==None:
+			nWorkers=os.cpu_count() or 1
+		chunkSize=max(1, len(modesLists)//(4*nWorkers))
+		
+		with concurrent.futures.ProcessPoolExecutor(
+				max_workers=nWorkers, 
+				initializer=_initPlannerWorker,
+				initargs=(model,)) as executor:
+			return tuple(executor.map(_runScenarioInWorker, modesLists,
+					itertools.repeat(engine), chunksize=chunkSize))
+	
+	# Subjects and then their ed. sources
+	def __getItems(self):
+		items=list(self.__subjectList)
+		for subject in self.__subjectList:
+			items.extend(subject.getEdSources())
+		return items
+	
+	# Monte Carlo forecasting
+	# Stochastic simulation of trials [firstTrial, firstTrial+nTrials).
+	# Each trial has its own random generator seeded by 
+	# (seed, trial number), so results don't depend on the way the 
+	# trials are distributed between workers.
+	# Returns (nTrials, nSuccess, histograms of end days)
+	def runTrials(self, firstTrial, nTrials, seed, perfDistribution):
+		items=self.__getItems()
+		nDays=self.getNDays()
+		startDate=self.__milestoneList[0].getDate()
+		histograms=[]
+		for item in items:
+			histograms.append(array.array("l", [0]*(nDays+1)))
+		nSuccess=0
+		
+		collector=KeyDateCollector()
+		self.addEventListener(collector)
+		try:
+			for trial in range(firstTrial, firstTrial+nTrials):
+				collector.refresh()
+				rnd=random.Random("%d:%d" % (seed, trial))
+				if self.genKeyDates(perfDistribution=perfDistribution,
+						rnd=rnd):
+					nSuccess+=1
+				for i in range(0, len(items)):
+					endDate=self.__getEndDate(collector, items[i])
+					if endDate==None:
+						histograms[i][nDays]+=1
+					else:
+						histograms[i][(endDate-startDate).days]+=1
+		finally:
+			self.removeEventListener(collector)
+		return (nTrials, nSuccess, tuple(histograms))
+	
+	# Monte Carlo forecasting
+	# nTrials stochastic simulations in worker processes. 
+	# Chunk results are merged into ForecastResult as soon as they 
+	# are ready; at most 2 chunks per worker are in progress.
+	def forecastMonteCarlo(self, nTrials, perfDistribution, seed=0,
+			nWorkers=None, chunkSize=100):
+		self.compile() # input validation
+		
+		model=self.__copyModel()
+		model.reset()
+		
+		result=ForecastResult(self.__getItems(), 
+				self.__milestoneList[0].getDate(), self.getNDays())
+		
+		if nWorkers==None:
+			nWorkers=os.cpu_count() or 1
+		
+		with concurrent.futures.ProcessPoolExecutor(
+				max_workers=nWorkers, 
+				initializer=_initPlannerWorker,
+				initargs=(model,)) as executor:
+			pending=set()
+			firstTrial=0
+			while firstTrial<nTrials or len(pending)>0:
+				while firstTrial<nTrials and len(pending)<2*nWorkers:
+					n=min(chunkSize, nTrials-firstTrial)
+					pending.add(executor.submit(_runTrialsInWorker,
+							firstTrial, n, seed, perfDistribution))
+					firstTrial+=n
+				done, pending = concurrent.futures.wait(pending, 
+						return_when=concurrent.futures.FIRST_COMPLETED)
+				for future in done:
+					result.addTrials(*future.result())
+		return result
+	
+	# Goal seek
+	# Feasibility of the model copy with scaled performance
+	def __probePerfMultiplier(self, model, modes, modelSubject, 
+			multiplier):
+		scaledModes={}
+		for subject in modes:
+			if modelSubject==None or subject==modelSubject:
+				scaledModes[subject]=[]
+				for mode in modes[subject]:
+					scaledModes[subject].append(
+							[mode[0]*multiplier]+list(mode[1:]))
+			else:
+				scaledModes[subject]=modes[subject]
+		model.setTrainingModes(scaledModes)
+		return model.isFeasible()
+	
+	# Goal seek
+	# Feasibility of the model copy with the first milestone 
+	# moved by nDays
+	def __probeStartDate(self, model, firstMilestone, nDays):
+		model.__milestoneList[0]=Milestone(firstMilestone.getDate()
+				+datetime.timedelta(days=nDays),
+				firstMilestone.getDescr())
+		return model.isFeasible()
+	
+	# Goal seek
+	# The smallest multiplier of the daily performance (of all 
+	# subjects or of the given subject) that makes the plan feasible.
+	# Bisection with the given precision over the silent re-simulation
+	# of the model copy. Returns None if the plan is not feasible 
+	# even with maxMultiplier.
+	def findMinPerfMultiplier(self, subject=None, precision=0.01,
+			maxMultiplier=1024):
+		self.compile() # input validation
+		if subject!=None and subject not in self.__subjectList:
+			raise Exception("Error! No such subject in the planner!")
+		
+		model=self.__copyModel()
+		model.reset()
+		modelSubject=None
+		if subject!=None:
+			modelSubject=model.__subjectList[
+					self.__subjectList.index(subject)]
+		modes=model.__trainingModes.getModes()
+		
+		# Search for the upper bound
+		hi=1
+		while not self.__probePerfMultiplier(model, modes, modelSubject,
+				hi):
+			if hi>=maxMultiplier:
+				return None
+			hi=min(hi*2, maxMultiplier)
+		lo=hi/2
+		if hi==1:
+			lo=0
+		
+		while hi-lo>precision:
+			mid=(lo+hi)/2
+			if self.__probePerfMultiplier(model, modes, modelSubject, 
+					mid):
+				hi=mid
+			else:
+				lo=mid
+		return hi
+	
+	# Goal seek
+	# The latest date of the first milestone (before the second one)
+	# for which the plan is still feasible. Bisection with the given 
+	# precision (days). Returns None if the plan is not feasible.
+	def findLatestStartDate(self, precision=1):
+		self.compile() # input validation
+		
+		if self.__progress!=None:
+			raise Exception("Error! findLatestStartDate can't be used"
+					+ " with the loaded progress!")
+		
+		model=self.__copyModel()
+		model.reset()
+		firstMilestone=self.__milestoneList[0]
+		nDaysMax=(self.__milestoneList[1].getDate()
+				- firstMilestone.getDate()).days
+		
+		if not self.__probeStartDate(model, firstMilestone, 0):
+			return None
+		
+		# lo - feasible, hi - not feasible (or not allowed)
+		lo=0
+		hi=nDaysMax
+		while hi-lo>precision:
+			mid=(lo+hi)//2
+			if self.__probeStartDate(model, firstMilestone, mid):
+				lo=mid
+			else:
+				hi=mid
+		return firstMilestone.getDate()+datetime.timedelta(days=lo)
+	
+	# Independent copy of the model (subjects, sources, milestones
+	# and training modes) without event listeners
+	def __copyModel(self):
+		planner=ImitPlanner({})
+		memo={id(self): planner}
+		subjectList, trainingModes, milestoneList, progress = \
+				copy.deepcopy((self.__subjectList, 
+				self.__trainingModes.getModes(), self.__milestoneList,
+				self.__progress), memo)
+		planner.__subjectList=subjectList
+		planner.__trainingModes=TrainingModes(trainingModes)
+		planner.__milestoneList=milestoneList
+		planner.__fDirty=self.__fDirty
+		planner.__accounting=self.__accounting
+		planner.__progress=progress
+		for subject in subjectList:
+			planner.__indexDependencies(subject)
+		return planner
+	
+	# Simulation without events for listeners and without changing 
+	# the state of the model
+	def __simulateSilently(self):
+		if self.hasEventListeners():
+			return self.__copyModel().genKeyDates(
+					engine=SimulationEngine.NEXT_EVENT)
+		state=self.saveState()
+		checkpointData=self.__getCheckpointData()
+		fTrace, trace = self.__fTrace, self.__trace
+		self.__fTrace=False
+		try:
+			return self.genKeyDates(engine=SimulationEngine.NEXT_EVENT)
+		finally:
+			self.restoreState(state)
+			self.__setCheckpointData(checkpointData)
+			self.__fTrace, self.__trace = fTrace, trace
+	
+	# Fast feasibility check
+	# Can the feasibility be determined without simulation?
+	def __isDecidable(self, compiledModes):
+		for i in range(1, len(self.__milestoneList)):
+			if self.__milestoneList[i].getDate() <= \
+					self.__milestoneList[i-1].getDate():
+				return False
+		for subject in self.__subjectList:
+			if len(subject.getEdSources())==0:
+				return False
+			for edSource in subject.getEdSources():
+				if not isinstance(edSource, 
+						(AbstractProblemBook, FixedTimeTask)):
+					return False
+		for i in range(0, compiledModes.getNIntervals()):
+			for perf in compiledModes.getPerfArray(i):
+				if not isinstance(perf, numbers.Real) or perf<0:
+					return False
+		return True
+	
+	# Fast feasibility check
+	# Upper and lower bounds of the daily performance 
+	# of the subject in each time interval
+	def __calcPerfBounds(self, compiledModes, subjIndex):
+		upperBounds=[]
+		lowerBounds=[]
+		for i in range(0, compiledModes.getNIntervals()):
+			perfArray=compiledModes.getPerfArray(i)
+			if compiledModes.isShared(subjIndex, i):
+				# The subject can get the performance of the whole 
+				# group, but not less than the minimum performance 
+				# of a group member
+				groupPerf=[]
+				for index in compiledModes.getGroups(i)[
+						compiledModes.getGID(subjIndex, i)]:
+					groupPerf.append(perfArray[index])
+				upperBounds.append(sum(groupPerf))
+				lowerBounds.append(min(groupPerf))
+			else:
+				upperBounds.append(perfArray[subjIndex])
+				lowerBounds.append(perfArray[subjIndex])
+		return upperBounds, lowerBounds
+	
+	# Fast feasibility check
+	# Consumption of nEx units starting from the day with avail units
+	# left. Returns (day of completion, units left on that day) 
+	# or None if there is not enough time
+	def __walkUnits(self, day, avail, nEx, perfList, intStartDays):
+		if avail>=nEx:
+			return (day, avail-nEx)
+		nEx-=avail
+		day+=1
+		while day<intStartDays[-1]:
+			i=bisect.bisect_right(intStartDays, day)-1
+			nDaysInt=intStartDays[i+1]-day
+			if perfList[i]>0:
+				k=math.ceil(nEx/perfList[i])
+				if k<=nDaysInt:
+					return (day+k-1, max(0, k*perfList[i]-nEx))
+				nEx-=nDaysInt*perfList[i]
+			day=intStartDays[i+1]
+		return None
+	
+	# Fast feasibility check
+	# The same for the number of days with non-zero performance 
+	# (FixedTimeTask). Returns the day of completion or None
+	def __walkDays(self, day, avail, nDays, perfList, intStartDays):
+		if avail>0:
+			nDays-=1
+			if nDays==0:
+				return day
+		if nDays<=0:
+			return None # never completed
+		day+=1
+		while day<intStartDays[-1]:
+			i=bisect.bisect_right(intStartDays, day)-1
+			nDaysInt=intStartDays[i+1]-day
+			if perfList[i]>0:
+				if nDays<=nDaysInt:
+					return day+nDays-1
+				nDays-=nDaysInt
+			day=intStartDays[i+1]
+		return None
+	
+	# Fast feasibility check
+	# The day on which all mandatory sources of the subject are 
+	# completed (or None). In the optimistic mode the remainder of 
+	# the daily performance is passed to the next source, 
+	# otherwise it is lost.
+	def __calcFinishDay(self, subject, day, perfList, intStartDays,
+			fOptimistic):
+		# margin for rounding errors of the simulation
+		if fOptimistic:
+			margin=1-1e-9
+		else:
+			margin=1+1e-9
+		
+		sources=subject.getEdSources()
+		nNeeded=1
+		for i in range(0, len(sources)):
+			if sources[i].isMandatory():
+				nNeeded=i+1
+		
+		finishDay=None
+		avail=0
+		if day<intStartDays[-1]:
+			avail=perfList[bisect.bisect_right(intStartDays, day)-1]
+		for edSource in sources[:nNeeded]:
+			if isinstance(edSource, FixedTimeTask):
+				finishDay=self.__walkDays(day, avail, 
+						edSource.getNDays(), perfList, intStartDays)
+				if finishDay==None:
+					return None
+				avail=0
+			else:
+				res=self.__walkUnits(day, avail, 
+						edSource.getNExTotal()*margin,
+						perfList, intStartDays)
+				if res==None:
+					return None
+				finishDay, avail = res
+				if not fOptimistic:
+					avail=0
+			day=finishDay
+			if avail<=0:
+				# the next source starts on the next day
+				day+=1
+				if day<intStartDays[-1]:
+					avail=perfList[
+						bisect.bisect_right(intStartDays, day)-1]
+		return finishDay
+	
+	# Fast feasibility check
+	# Returns the same value as genKeyDates, but without simulation 
+	# and events (if possible). Time intervals, training modes and 
+	# startAfter chains are used to calculate the earliest and 
+	# the latest finish dates of each subject. If the result can't 
+	# be determined in this way, the simulation of the model copy is 
+	# performed.
+	def isFeasible(self):
+		compiledModes=self.compile()
+		
+		if self.__progress!=None or \
+				not self.__isDecidable(compiledModes):
+			return self.__simulateSilently()
+		
+		startDate=self.__milestoneList[0].getDate()
+		intStartDays=[]
+		for ms in self.__milestoneList:
+			intStartDays.append((ms.getDate()-startDate).days)
+		
+		# Finish days: subject -> (earliest, latest)
+		finishDays={}
+		
+		subjIndices={}
+		for index in range(0, len(self.__subjectList)):
+			subjIndices[self.__subjectList[index]]=index
+		
+		fUndecided=False
+		for subject in self.__subjectList:
+			# Subjects preceding the current one (startAfter) are 
+			# processed first (there are no cycles after compile)
+			stack=[subject]
+			while len(stack)>0:
+				subj=stack[-1]
+				if subj in finishDays:
+					stack.pop()
+					continue
+				if subj not in subjIndices:
+					# never studied
+					finishDays[subj]=(None, None)
+					stack.pop()
+					continue
+				
+				fReady=True
+				for prevSubj in subj.getPrevSubjects():
+					if prevSubj not in finishDays:
+						stack.append(prevSubj)
+						fReady=False
+				if not fReady:
+					continue
+				stack.pop()
+				
+				# The subject is unlocked on the day after the last 
+				# previous subject is completed
+				earliestStartDay, latestStartDay = 0, 0
+				fNever=False
+				for prevSubj in subj.getPrevSubjects():
+					earliestFinishDay, latestFinishDay = \
+						finishDays[prevSubj]
+					if earliestFinishDay==None:
+						fNever=True
+						break
+					earliestStartDay=max(earliestStartDay,
+							earliestFinishDay+1)
+					if latestFinishDay!=None:
+						latestStartDay=max(latestStartDay,
+								latestFinishDay+1)
+					else:
+						latestStartDay=intStartDays[-1]
+				if fNever:
+					finishDays[subj]=(None, None)
+					continue
+				
+				upperBounds, lowerBounds = self.__calcPerfBounds(
+						compiledModes, subjIndices[subj])
+				earliestFinishDay=self.__calcFinishDay(subj, 
+						earliestStartDay, upperBounds, intStartDays,
+						True)
+				latestFinishDay=None
+				if earliestFinishDay!=None:
+					latestFinishDay=self.__calcFinishDay(subj,
+							latestStartDay, lowerBounds, intStartDays,
+							False)
+				finishDays[subj]=(earliestFinishDay, latestFinishDay)
+			
+			earliestFinishDay, latestFinishDay = finishDays[subject]
+			if earliestFinishDay==None:
+				return False
+			if latestFinishDay==None:
+				fUndecided=True
+		
+		if fUndecided:
+			return self.__simulateSilently()
+		return True
+	
+	# date - the current date by default
+	def __fireKeyDate(self, dateType, fEnd, payload, date=None):
+		if date==None:
+			date=self.__getCurDate()
+		if self.__keyDateLog!=None:
+			self.__keyDateLog.append((date, dateType, fEnd, payload))
+		if self.__resultLog!=None:
+			self.__resultLog.append((date, dateType, fEnd, payload))
+		if self.hasEventHandlers("KeyDate", dateType):
+			self.fireEvent(Event("KeyDate", 
+					KeyDate(date, dateType, fEnd, payload), dateType))
+	
+	def __onSourceCompleted(self, event):
+		self.__fireKeyDate(DateType.ED_SOURCE, True, 
+				event.getPayload())
+	
+	def __onSubjectCompleted(self, event):
+		self.__fireKeyDate(DateType.SUBJECT, True, event.getPayload())
+	
+	def __onSourceStarted(self, event): #issue 5
+		self.__fireKeyDate(DateType.ED_SOURCE, False, 
+				event.getPayload())
+	
+	def __onSubjectStarted(self, event):
+		self.__fireKeyDate(DateType.SUBJECT, False, event.getPayload())
+	
+	# Events from subjects
+	def getEventHandlers(self):
+		return {"Source completed!": self.__onSourceCompleted,
+				"Subject completed!": self.__onSubjectCompleted,
+				"Source started!": self.__onSourceStarted,
+				"Subject started!": self.__onSubjectStarted}
+	
+	def genTimeIntDescrRecords(self):
+		for interval in self.__makeTimeIntervals():
+			self.fireEvent(Event("Interval Descr!",	interval))
+	
+	def __makeTimeIntervals(self):
+		compiledModes=self.compile()
+		intervals=[]
+		for i in range(0, len(self.__milestoneList)-1):
+			interval = TimeInterval(self.__milestoneList[i],
+					self.__milestoneList[i+1])
+			perfArray=compiledModes.getPerfArray(i)
+			for index in range(0, len(self.__subjectList)):
+				subject=self.__subjectList[index]
+				if compiledModes.isShared(index, i):
+					
+					GID = compiledModes.getGID(index, i)
+					interval.addSharedPerfSubjRecord(GID,
+						TimeIntervalDescrRecord(subject, 
+							perfArray[index]))
+				else:
 					interval.addFixedPerfSubjRecord(
 						TimeIntervalDescrRecord(subject, 
-							self.__trainingModes.getPerf(subject,i)))
-			self.fireEvent(Event("Interval Descr!",	interval))
+							perfArray[index]))
+			intervals.append(interval)
+		return intervals
 	
 	def sentData4PUMLGeneration(self):
 		self.fireEvent(event("SetMSList", self.__milestoneList))
 		self.fireEvent(event("SetNDays", self.getNDays()))
 		
 		
+# End dates of subjects and sources
+class KeyDateCollector(IEventListener):
+	def __init__(self):
+		self.refresh()
+	
+	def refresh(self):
+		self.__endDates={}
+		self.__unfinishedSourcesStat=()
+	
+	def __onSourceKeyDate(self, event):
+		kd=event.getPayload()
+		if kd.getFEnd():
+			self.__endDates[kd.getPayload().getEdSource()]=kd.getDate()
+	
+	def __onSubjectKeyDate(self, event):
+		kd=event.getPayload()
+		if kd.getFEnd():
+			self.__endDates[kd.getPayload()]=kd.getDate()
+	
+	def __onUnfinishedSourcesStat(self, event):
+		self.__unfinishedSourcesStat=event.getPayload()
+	
+	def getEventHandlers(self):
+		return {("KeyDate", DateType.ED_SOURCE): self.__onSourceKeyDate,
+				("KeyDate", DateType.SUBJECT): self.__onSubjectKeyDate,
+				"UnfinishedSourcesStat": self.__onUnfinishedSourcesStat}
+	
+	# None if the item has not been completed
+	def getEndDate(self, item):
+		return self.__endDates.get(item)
+	
+	def getUnfinishedSourcesStat(self):
+		return self.__unfinishedSourcesStat
+
+# Result of ImitPlanner.runScenario. Subjects and sources are 
+# represented by their indices (in the planner and in the subject)
+class ScenarioResult(object):
+	def __init__(self, fSuccess, subjEndDates, sourceEndDates,
+			unfinishedSourcesStat):
+		self.__fSuccess=fSuccess
+		self.__subjEndDates=subjEndDates
+		self.__sourceEndDates=sourceEndDates
+		self.__unfinishedSourcesStat=unfinishedSourcesStat
+	
+	def isFeasible(self):
+		return self.__fSuccess
+	
+	# Tuple of end dates (or None) per subject
+	def getSubjEndDates(self):
+		return self.__subjEndDates
+	
+	# Tuple of tuples of end dates (or None) per subject and source
+	def getSourceEndDates(self):
+		return self.__sourceEndDates
+	
+	# Tuple of (subject index, source index, progress description)
+	def getUnfinishedSourcesStat(self):
+		return self.__unfinishedSourcesStat
+
+# Tables of PlanResult (for getColumn and the writers)
+class PlanResultTable(enum.Enum):
+	KEY_DATES=1
+	UNFINISHED_SOURCES=2
+	INTERVALS=3
+
+# Result of ImitPlanner.genKeyDates(fResult=True). Key dates, 
+# unfinished sources and interval descriptions are stored by columns 
+# and can be written to a file (CSV or JSON Lines) without events
+class PlanResult(object):
+	COLUMNS={
+		PlanResultTable.KEY_DATES: 
+			("date", "dateType", "event", "subject", "source", 
+			"milestone"),
+		PlanResultTable.UNFINISHED_SOURCES: 
+			("subject", "source", "mandatory", "progress"),
+		PlanResultTable.INTERVALS: 
+			("startDate", "endDate", "subject", "perf", "GID", 
+			"startAfter")}
+	
+	# keyDateLog - list of (date, dateType, fEnd, payload)
+	# unfinishedSourcesStat - as in "UnfinishedSourcesStat" event
+	# intervals - list of TimeInterval
+	def __init__(self, fSuccess, keyDateLog, unfinishedSourcesStat,
+			intervals, fVerbose=False):
+		self.__fSuccess=fSuccess
+		self.__unfinishedSourcesStat=unfinishedSourcesStat
+		self.__intervals=tuple(intervals)
+		self.__fVerbose=fVerbose
+		
+		# Key dates (fEnd: -1 - None)
+		self.__kdDates=array.array("l")
+		self.__kdTypes=array.array("b")
+		self.__kdFEnd=array.array("b")
+		payloads=[]
+		for date, dateType, fEnd, payload in keyDateLog:
+			self.__kdDates.append(date.toordinal())
+			self.__kdTypes.append(dateType.value)
+			self.__kdFEnd.append(-1 if fEnd==None else int(fEnd))
+			payloads.append(payload)
+		self.__kdPayloads=tuple(payloads)
+		
+		# Unfinished sources
+		self.__ufSubjects=[]
+		self.__ufSources=[]
+		self.__ufMandatory=array.array("b")
+		self.__ufProgress=[]
+		for subj, stat in unfinishedSourcesStat:
+			for edSource, progress in stat:
+				self.__ufSubjects.append(subj.getDescr())
+				self.__ufSources.append(edSource.getDescr())
+				self.__ufMandatory.append(edSource.isMandatory())
+				self.__ufProgress.append(progress)
+		
+		# Interval descriptions (GID: None - fixed performance)
+		self.__intStartDates=array.array("l")
+		self.__intEndDates=array.array("l")
+		self.__intSubjects=[]
+		self.__intPerf=array.array("d")
+		self.__intGIDs=[]
+		self.__intPrevSubjects=[]
+		for interval in intervals:
+			records=[]
+			d=interval.getSharedPerfSubjRecords() # alias
+			for GID in d:
+				for record in d[GID]:
+					records.append((GID, record))
+			for record in interval.getFixedPerfSubjRecords():
+				records.append((None, record))
+			for GID, record in records:
+				self.__intStartDates.append(
+						interval.getStartDate().toordinal())
+				self.__intEndDates.append(
+						interval.getEndDate().toordinal())
+				self.__intSubjects.append(record.getSubjName())
+				self.__intPerf.append(record.getSubjPerf())
+				self.__intGIDs.append(GID)
+				self.__intPrevSubjects.append(record.getPrevSubjName())
+	
+	def isFeasible(self):
+		return self.__fSuccess
+	
+	# Verbose mode of genKeyDates (start dates are included)
+	def isVerbose(self):
+		return self.__fVerbose
+	
+	def getTimeIntervals(self):
+		return self.__intervals
+	
+	def getNKeyDates(self):
+		return len(self.__kdDates)
+	
+	def getKeyDate(self, index):
+		fEnd=self.__kdFEnd[index]
+		return KeyDate(datetime.date.fromordinal(self.__kdDates[index]),
+				DateType(self.__kdTypes[index]), 
+				None if fEnd==-1 else fEnd==1,
+				self.__kdPayloads[index])
+	
+	def getKeyDates(self):
+		return tuple(self.getKeyDate(i) 
+				for i in range(0, len(self.__kdDates)))
+	
+	# Tuple of (subject, ((ed. source, progress description), ...))
+	def getUnfinishedSourcesStat(self):
+		return self.__unfinishedSourcesStat
+	
+	# Column values as they are written to the files
+	def getColumn(self, table, name):
+		return self.__getColumns(table)[
+				PlanResult.COLUMNS[table].index(name)]
+	
+	def __getColumns(self, table):
+		if table==PlanResultTable.KEY_DATES:
+			return self.__getKeyDateColumns()
+		if table==PlanResultTable.UNFINISHED_SOURCES:
+			return (self.__ufSubjects, self.__ufSources, 
+					[bool(f) for f in self.__ufMandatory], 
+					self.__ufProgress)
+		if table==PlanResultTable.INTERVALS:
+			return (self.__isoDates(self.__intStartDates),
+					self.__isoDates(self.__intEndDates),
+					self.__intSubjects, self.__intPerf, self.__intGIDs,
+					self.__intPrevSubjects)
+		raise Exception("Error! Unknown table!")
+	
+	def __isoDates(self, ordinals):
+		# Key dates come in order, so the conversion is cached
+		isoDates=[]
+		lastOrdinal=None
+		for ordinal in ordinals:
+			if ordinal!=lastOrdinal:
+				lastOrdinal=ordinal
+				isoDate=datetime.date.fromordinal(ordinal).isoformat()
+			isoDates.append(isoDate)
+		return isoDates
+	
+	def __getKeyDateColumns(self):
+		dateTypeNames=[None]+[dateType.name for dateType in DateType]
+		eventNames={-1: None, 0: "START", 1: "END"}
+		subjects=[]
+		sources=[]
+		milestones=[]
+		for dateType, payload in zip(self.__kdTypes, 
+				self.__kdPayloads):
+			subject=None
+			source=None
+			milestone=None
+			if dateType==DateType.ED_SOURCE.value:
+				subject=payload.getSubject().getDescr()
+				source=payload.getEdSource().getDescr()
+			elif dateType==DateType.SUBJECT.value:
+				subject=payload.getDescr()
+			else:
+				milestone=payload.getDescr()
+			subjects.append(subject)
+			sources.append(source)
+			milestones.append(milestone)
+		return (self.__isoDates(self.__kdDates),
+				[dateTypeNames[dateType] for dateType in self.__kdTypes],
+				[eventNames[fEnd] for fEnd in self.__kdFEnd],
+				subjects, sources, milestones)
+	
+	# f - file opened with newline=""
+	def writeCSV(self, f, table=PlanResultTable.KEY_DATES, 
+			fHeader=True):
+		writer=csv.writer(f)
+		if fHeader:
+			writer.writerow(PlanResult.COLUMNS[table])
+		writer.writerows(zip(*self.__getColumns(table)))
+	
+	# One JSON object per line
+	def writeJSONLines(self, f, table=PlanResultTable.KEY_DATES):
+		names=PlanResult.COLUMNS[table]
+		encoder=json.JSONEncoder()
+		f.writelines(encoder.encode(dict(zip(names, row)))+"\n" 
+				for row in zip(*self.__getColumns(table)))
+
+# Cumulative progress (units, days for FixedTimeTask) of subjects and 
+# ed. sources at the end of each day of the simulation. The progress 
+# of a subject is the sum of the progress of its sources. 
+# Values are stored in one float32 array (item-major), 
+# 4 bytes per item per day.
+class ProgressTrace(object):
+	# prevTrace, resumeDate - the days before resumeDate are copied 
+	# from the trace of the previous simulation (checkpoints)
+	def __init__(self, startDate, nDays, subjectList, prevTrace=None,
+			resumeDate=None):
+		self.__startDate=startDate
+		self.__nDays=nDays
+		
+		# item -> row, (subject, sources) in row order
+		self.__rows={}
+		self.__layout=[]
+		for subject in subjectList:
+			self.__rows[subject]=len(self.__rows)
+			for edSource in subject.getEdSources():
+				self.__rows[edSource]=len(self.__rows)
+			self.__layout.append((subject, subject.getEdSources()))
+		nRows=len(self.__rows)
+		
+		self.__values=array.array("f", bytes(4*nRows*nDays))
+		# Progress at the end of the last recorded day
+		self.__lastValues=self.__readValues()
+		self.__nRecorded=0
+		
+		if prevTrace==None:
+			self.__initValues=array.array("f", self.__lastValues)
+		else:
+			self.__initValues=array.array("f", prevTrace.__initValues)
+			self.__nRecorded=(resumeDate-startDate).days
+			n=min(self.__nRecorded, prevTrace.__nDays)
+			for row in range(0, nRows):
+				self.__values[row*nDays:row*nDays+n]= \
+						prevTrace.__values[row*prevTrace.__nDays:
+							row*prevTrace.__nDays+n]
+	
+	def __readValues(self):
+		values=[]
+		for subject, edSources in self.__layout:
+			subjRow=len(values)
+			values.append(0)
+			for edSource in edSources:
+				values.append(edSource.getProgress())
+			values[subjRow]=sum(values[subjRow+1:])
+		return values
+	
+	# Records the progress at the end of the next nDays days 
+	# (linear progress during the days of the next-event engine jump)
+	def record(self, nDays=1):
+		if self.__nRecorded+nDays>self.__nDays:
+			raise Exception("Error! The trace is full!")
+		values=self.__readValues()
+		a=self.__values # alias
+		for row in range(0, len(values)):
+			index=row*self.__nDays+self.__nRecorded
+			v0=self.__lastValues[row]
+			v1=values[row]
+			if nDays==1:
+				a[index]=v1
+			elif v0==v1:
+				a[index:index+nDays]=array.array("f", [v1])*nDays
+			else:
+				for k in range(1, nDays+1):
+					a[index+k-1]=v0+(v1-v0)*k/nDays
+		self.__lastValues=values
+		self.__nRecorded+=nDays
+	
+	def getStartDate(self):
+		return self.__startDate
+	
+	# The number of recorded days
+	def getNDays(self):
+		return self.__nRecorded
+	
+	def getMemorySize(self):
+		return self.__values.buffer_info()[1]*self.__values.itemsize
+	
+	def __getRow(self, item):
+		if item not in self.__rows:
+			raise Exception("Error! No such subject or ed. source in"
+					+ " the trace!")
+		return self.__rows[item]
+	
+	def __getDayIndex(self, date):
+		dayIndex=(date-self.__startDate).days
+		if dayIndex>=self.__nRecorded:
+			raise Exception("Error! No data for this date!")
+		return dayIndex
+	
+	# Progress at the end of the day (before the start date - 
+	# the initial progress)
+	def getProgress(self, item, date):
+		row=self.__getRow(item)
+		dayIndex=self.__getDayIndex(date)
+		if dayIndex<0:
+			return self.__initValues[row]
+		return self.__values[row*self.__nDays+dayIndex]
+	
+	# Progress at the end of each day from date1 to date2 
+	# (inclusive, within the trace), array of floats
+	def getProgressRange(self, item, date1, date2):
+		row=self.__getRow(item)
+		index1=(date1-self.__startDate).days
+		index2=self.__getDayIndex(date2)
+		if index1<0 or index1>index2:
+			raise Exception("Error! Wrong date range!")
+		return self.__values[row*self.__nDays+index1:
+				row*self.__nDays+index2+1]
+	
+	# The first day at the end of which the progress reaches 
+	# the value (binary search), None if it is not reached
+	def getDateReached(self, item, progress):
+		row=self.__getRow(item)
+		if self.__initValues[row]>=progress:
+			return self.__startDate-datetime.timedelta(days=1)
+		lo=row*self.__nDays
+		index=bisect.bisect_left(self.__values, progress, lo,
+				lo+self.__nRecorded)
+		if index==lo+self.__nRecorded:
+			return None
+		return self.__startDate+datetime.timedelta(days=index-lo)
+
+# Random daily performance for the stochastic mode of genKeyDates
+class AbstractPerfDistribution(object):
+	# Abstract method
+	# Returns a random daily output for the nominal performance
+	def sample(self, rnd, perf):
+		raise Exception("Interface method not implemented")
+
+# Normal distribution with the standard deviation relative to the 
+# nominal performance (negative values are replaced by zero)
+class NormalPerfDistribution(AbstractPerfDistribution):
+	def __init__(self, relStdDev):
+		self.__relStdDev=relStdDev
+	def sample(self, rnd, perf):
+		return max(0, rnd.gauss(perf, perf*self.__relStdDev))
+
+# Uniform distribution in [perf*(1-relSpread), perf*(1+relSpread)]
+class UniformPerfDistribution(AbstractPerfDistribution):
+	def __init__(self, relSpread):
+		self.__relSpread=relSpread
+	def sample(self, rnd, perf):
+		return max(0, rnd.uniform(perf*(1-self.__relSpread), 
+				perf*(1+self.__relSpread)))
+
+# Result of ImitPlanner.forecastMonteCarlo. 
+# Trials are aggregated into histograms of end days, so the memory 
+# doesn't depend on the number of trials.
+class ForecastResult(object):
+	def __init__(self, items, startDate, nDays):
+		self.__itemIndices={}
+		for i in range(0, len(items)):
+			self.__itemIndices[items[i]]=i
+		self.__startDate=startDate
+		self.__nDays=nDays
+		self.__nTrials=0
+		self.__nSuccess=0
+		# The last element - number of trials without completion
+		self.__histograms=[]
+		for item in items:
+			self.__histograms.append(array.array("l", [0]*(nDays+1)))
+	
+	def addTrials(self, nTrials, nSuccess, histograms):
+		self.__nTrials+=nTrials
+		self.__nSuccess+=nSuccess
+		for i in range(0, len(histograms)):
+			hist=self.__histograms[i] # alias
+			for day in range(0, len(hist)):
+				hist[day]+=histograms[i][day]
+	
+	def getNTrials(self):
+		return self.__nTrials
+	
+	def getSuccessProbability(self):
+		return self.__nSuccess/self.__nTrials
+	
+	# Probability of completion of the subject or the ed. source
+	def getCompletionProbability(self, item):
+		hist=self.__histograms[self.__itemIndices[item]]
+		return 1-hist[self.__nDays]/self.__nTrials
+	
+	# End date of the subject or the ed. source that is not exceeded 
+	# in the given percentage of trials (None if it is not completed)
+	def getPercentileDate(self, item, percentile):
+		hist=self.__histograms[self.__itemIndices[item]]
+		nTrialsMin=math.ceil(percentile/100*self.__nTrials)
+		n=0
+		for day in range(0, self.__nDays):
+			n+=hist[day]
+			if n>=max(nTrialsMin, 1):
+				return self.__startDate+datetime.timedelta(days=day)
+		return None
+	
+	# P50, P90 and P99 end dates
+	def getPercentileDates(self, item):
+		return {50: self.getPercentileDate(item, 50),
+				90: self.getPercentileDate(item, 90),
+				99: self.getPercentileDate(item, 99)}
+
+# Result of BatchSimulator.simulate. 
+# Key dates are stored as day offsets from the start date 
+# (-1 - no key date). Arrays are indexed by [plan, subject] and 
+# [plan, subject, source].
+class BatchSimulationResult(object):
+	def __init__(self, startDate, fSuccess, subjStartDays, subjEndDays,
+			sourceStartDays, sourceEndDays):
+		self.__startDate=startDate
+		self.__fSuccess=fSuccess
+		self.__subjStartDays=subjStartDays
+		self.__subjEndDays=subjEndDays
+		self.__sourceStartDays=sourceStartDays
+		self.__sourceEndDays=sourceEndDays
+	
+	def getStartDate(self):
+		return self.__startDate
+	def getSuccess(self):
+		return self.__fSuccess
+	def getSubjStartDays(self):
+		return self.__subjStartDays
+	def getSubjEndDays(self):
+		return self.__subjEndDays
+	def getSourceStartDays(self):
+		return self.__sourceStartDays
+	def getSourceEndDays(self):
+		return self.__sourceEndDays
+	
+	# Day offset -> date (or None)
+	def toDate(self, day):
+		if day<0:
+			return None
+		return self.__startDate+datetime.timedelta(days=int(day))
+
+# Vectorized simulation of many independent plans with the same 
+# milestones. The state of all plans (progress of the sources, 
+# current source, lock flags, shared performance per GID) is stored 
+# in NumPy arrays and all plans are advanced together day by day 
+# with the same rules as ImitPlanner.genKeyDates. Start dates are 
+# always generated (as in verbose mode). Planners are not changed.
+class BatchSimulator(object):
+	def __init__(self, planners):
+		if numpy==None:
+			raise Exception("Error! NumPy is required for "
+					+ "BatchSimulator")
+		if len(planners)==0:
+			raise Exception("Error! Planner list is empty")
+		
+		np=numpy # alias
+		milestones=planners[0].getMilestones()
+		self.__startDate=milestones[0].getDate()
+		self.__intStartDays=[]
+		for ms in milestones:
+			self.__intStartDays.append(
+					(ms.getDate()-self.__startDate).days)
+		for i in range(1, len(self.__intStartDays)):
+			if self.__intStartDays[i]<=self.__intStartDays[i-1]:
+				raise Exception("Error! Milestone dates must increase")
+		
+		compiledModesList=[]
+		for planner in planners:
+			if planner.getProgressAccounting()!=ProgressAccounting.FLOAT:
+				raise Exception("Error! BatchSimulator supports only "
+						+ "ProgressAccounting.FLOAT!")
+			if planner.getProgressDate()!=None:
+				raise Exception("Error! BatchSimulator doesn't support "
+						+ "the loaded progress!")
+			compiledModesList.append(planner.compile())
+			msDates=[ms.getDate() for ms in planner.getMilestones()]
+			if msDates!=[ms.getDate() for ms in milestones]:
+				raise Exception("Error! All plans must have the same"
+						+ " milestones")
+		
+		P=len(planners)
+		S=max(len(planner.getSubjects()) for planner in planners)
+		E=1
+		for planner in planners:
+			for subject in planner.getSubjects():
+				if len(subject.getEdSources())==0:
+					raise Exception("Error! Subject without ed. "
+							+ "sources: " + subject.getDescr())
+				E=max(E, len(subject.getEdSources()))
+		I=len(milestones)-1
+		# max number of previous subjects
+		K=1
+		for planner in planners:
+			for subject in planner.getSubjects():
+				K=max(K, len(subject.getPrevSubjects()))
+		
+		# Static arrays
+		self.__nTotal=np.zeros((P, S, E))
+		self.__fFTT=np.zeros((P, S, E), dtype=bool)
+		self.__nSources=np.zeros((P, S), dtype=np.int64)
+		# index of the last mandatory source (-1 - no mandatory)
+		self.__lastMand=np.full((P, S), -1, dtype=np.int64)
+		# indices of the previous subjects 
+		# (-1 - none, -2 - not in plan)
+		self.__prevIdx=np.full((P, S, K), -1, dtype=np.int64)
+		self.__fPadding=np.ones((P, S), dtype=bool)
+		self.__perf=np.zeros((I, P, S))
+		self.__fShared=np.zeros((I, P, S), dtype=bool)
+		# dense group index per plan and interval
+		self.__groupIdx=np.zeros((I, P, S), dtype=np.int64)
+		nGroups=1
+		
+		for p in range(0, P):
+			subjects=planners[p].getSubjects()
+			subjIndices={}
+			for s in range(0, len(subjects)):
+				subjIndices[subjects[s]]=s
+			for s in range(0, len(subjects)):
+				subject=subjects[s]
+				self.__fPadding[p, s]=False
+				edSources=subject.getEdSources()
+				self.__nSources[p, s]=len(edSources)
+				for e in range(0, len(edSources)):
+					edSource=edSources[e]
+					if isinstance(edSource, FixedTimeTask):
+						self.__fFTT[p, s, e]=True
+						self.__nTotal[p, s, e]=edSource.getNDays()
+					elif isinstance(edSource, AbstractProblemBook):
+						self.__nTotal[p, s, e]=edSource.getNExTotal()
+					else:
+						raise Exception("Error! Unsupported ed. source:"
+								+ " " + edSource.getDescr())
+					if edSource.isMandatory():
+						self.__lastMand[p, s]=e
+				prevSubjects=subject.getPrevSubjects()
+				for k in range(0, len(prevSubjects)):
+					self.__prevIdx[p, s, k]=subjIndices.get(
+							prevSubjects[k], -2)
+			for i in range(0, I):
+				cm=compiledModesList[p] # alias
+				self.__perf[i, p, :len(subjects)]=cm.getPerfArray(i)
+				self.__fShared[i, p, :len(subjects)]= \
+						cm.getSharedArray(i)
+				groups=cm.getGroups(i)
+				g=0
+				for GID in groups:
+					for s in groups[GID]:
+						self.__groupIdx[i, p, s]=g
+					g+=1
+				nGroups=max(nGroups, g)
+		self.__nGroups=nGroups
+		self.__shape=(P, S, E)
+	
+	def simulate(self):
+		np=numpy # alias
+		P, S, E = self.__shape
+		rows=np.arange(P)
+		rows2D=rows[:, None]
+		
+		# State arrays
+		counter=np.zeros((P, S, E))
+		curIdx=np.zeros((P, S), dtype=np.int64)
+		fComplete=self.__fPadding.copy()
+		fFull=self.__fPadding.copy()
+		fLocked=(self.__prevIdx!=-1).any(axis=2) & ~self.__fPadding
+		fSubjUsed=np.zeros((P, S), dtype=bool)
+		fSourceUsed=np.zeros((P, S, E), dtype=bool)
+		
+		# Results
+		subjStartDays=np.full((P, S), -1, dtype=np.int32)
+		subjEndDays=np.full((P, S), -1, dtype=np.int32)
+		sourceStartDays=np.full((P, S, E), -1, dtype=np.int32)
+		sourceEndDays=np.full((P, S, E), -1, dtype=np.int32)
+		
+		fNoPrev=self.__prevIdx==-1
+		fHasPrev=self.__prevIdx>=0
+		prevIdx=np.maximum(self.__prevIdx, 0)
+		rows3D=rows[:, None, None]
+		
+		for i in range(0, len(self.__intStartDays)-1):
+			perf=self.__perf[i]
+			fShared=self.__fShared[i]
+			groupIdx=self.__groupIdx[i]
+			for day in range(self.__intStartDays[i], 
+					self.__intStartDays[i+1]):
+				
+				# Unlock subjects whose previous subjects were 
+				# completed on one of the previous days
+				fLocked&=~(fNoPrev | (fHasPrev 
+						& fComplete[rows3D, prevIdx])).all(axis=2)
+				
+				# Shared performance per group (subject order 
+				# as in genKeyDates for the same rounding)
+				fSharedActive=fShared & ~fLocked
+				sharedPerf=np.zeros((P, self.__nGroups))
+				nShared=np.zeros((P, self.__nGroups), dtype=np.int64)
+				for s in range(0, S):
+					g=groupIdx[:, s]
+					sharedPerf[rows, g]+=np.where(fSharedActive[:, s],
+							perf[:, s], 0.0)
+					nShared[rows, g]+=fSharedActive[:, s] & ~fFull[:, s]
+				nSharedSubj=nShared[rows2D, groupIdx]
+				dailyPerf=np.where(fShared, sharedPerf[rows2D, groupIdx]
+						/np.maximum(nSharedSubj, 1), perf)
+				
+				fSolve=~fLocked & ~fFull & (dailyPerf>0)
+				
+				# Subject started
+				fStart=fSolve & ~fSubjUsed
+				subjStartDays[fStart]=day
+				fSubjUsed|=fStart
+				
+				rem=self.__consume(day, dailyPerf, fSolve, counter,
+						curIdx, fComplete, fFull, fSourceUsed, 
+						subjEndDays, sourceStartDays, sourceEndDays)
+				
+				# issue #6: the remainder goes to the next sources
+				fSolve=fSolve & (rem>0) & ~fFull
+				while fSolve.any():
+					rem=self.__consume(day, rem, fSolve, counter, 
+						curIdx, fComplete, fFull, fSourceUsed, 
+						subjEndDays, sourceStartDays, sourceEndDays)
+					fSolve=fSolve & (rem>0) & ~fFull
+		
+		return BatchSimulationResult(self.__startDate, 
+				fComplete.all(axis=1), subjStartDays, subjEndDays,
+				sourceStartDays, sourceEndDays)
+	
+	# Use of the current sources of subjects marked in fSolve. 
+	# Returns the remainder of the performance
+	def __consume(self, day, nExSolved, fSolve, counter, curIdx, 
+			fComplete, fFull, fSourceUsed, subjEndDays, 
+			sourceStartDays, sourceEndDays):
+		np=numpy # alias
+		P, S, E = self.__shape
+		idx=np.minimum(curIdx, E-1)[:, :, None]
+		
+		# Source started
+		fStart=fSolve & ~np.take_along_axis(fSourceUsed, idx, 2)[:,:,0]
+		np.put_along_axis(sourceStartDays, idx, np.where(fStart, day,
+			np.take_along_axis(sourceStartDays, idx, 2)[:,:,0])[:,:,None],
+			2)
+		np.put_along_axis(fSourceUsed, idx, (fStart 
+			| np.take_along_axis(fSourceUsed, idx, 2)[:,:,0])[:,:,None],
+			2)
+		
+		cnt=np.take_along_axis(counter, idx, 2)[:, :, 0]
+		nTotal=np.take_along_axis(self.__nTotal, idx, 2)[:, :, 0]
+		fFTT=np.take_along_axis(self.__fFTT, idx, 2)[:, :, 0]
+		
+		# FixedTimeTask: one day per call
+		fComplFTT=fFTT & (cnt+1==nTotal)
+		# Books: units
+		total=cnt+nExSolved
+		fComplBook=~fFTT & (total>=nTotal)
+		
+		newCnt=np.where(fFTT, cnt+1, np.where(fComplBook, nTotal, total))
+		np.put_along_axis(counter, idx, np.where(fSolve, newCnt, 
+				cnt)[:, :, None], 2)
+		
+		fCompl=fSolve & (fComplFTT | fComplBook)
+		rem=np.where(fSolve & fComplBook, total-nTotal, 0.0)
+		
+		# Source completed
+		np.put_along_axis(sourceEndDays, idx, np.where(fCompl, day,
+			np.take_along_axis(sourceEndDays, idx, 2)[:,:,0])[:,:,None],
+			2)
+		curIdx+=fCompl
+		
+		# Subject completed (all mandatory sources)
+		fSubjCompl=fCompl & ~fComplete & (curIdx>self.__lastMand)
+		subjEndDays[fSubjCompl]=day
+		fComplete|=fSubjCompl
+		fFull|=fCompl & (curIdx==self.__nSources)
+		return rem
+
+# Worker process functions. Each worker process keeps its own copy 
+# of the model
+_workerPlanner=None
+
+def _initPlannerWorker(planner):
+	global _workerPlanner
+	_workerPlanner=planner
+
+# ImitPlanner.sweepTrainingModes
+def _runScenarioInWorker(modesList, engine):
+	planner=_workerPlanner # alias
+	return planner.runScenario(dict(zip(planner.getSubjects(), 
+			modesList)), engine)
+
+# ImitPlanner.forecastMonteCarlo
+def _runTrialsInWorker(firstTrial, nTrials, seed, perfDistribution):
+	return _workerPlanner.runTrials(firstTrial, nTrials, seed, 
+			perfDistribution)
+
+# GanttBatchExporter. The generator of the worker keeps 
+# the compiled template between the files
+_workerGenerator=None
+
+def _initGanttWorker(templateDir):
+	global _workerGenerator
+	_workerGenerator=PlantUMLCodeGenerator(templateDir)
+
+def _writeGanttInWorker(templateData, filename):
+	startTime=time.perf_counter()
+	_workerGenerator.writePlantUMLCode(templateData, filename)
+	return (filename, time.perf_counter()-startTime, 
+			os.path.getsize(filename))
+
 class SimpleView(IEventListener):
 	
 	def __showSubjRecords(self, recordsTuple):
@@ -803,103 +3305,175 @@ class SimpleView(IEventListener):
 						record.getSubjPerf()," elem. task/day"
 						, s)
 		
-	def onEvent(self, event):
-		if event.getMessage()=="KeyDate":
-			print(event.getPayload())
-		elif event.getMessage()=="Interval Descr!":
-			interval=event.getPayload()
-			print("***", interval.getStartDate(),
-					"-",interval.getEndDate(), "***")
-			print("Subjects with shared training performance:")
-			
-			d = interval.getSharedPerfSubjRecords() # alias
-			for GID in d:
-				print("Group #",GID)
-				self.__showSubjRecords(d[GID])
-			
-			print("Subjects with fixed training performance:")
-			self.__showSubjRecords(interval.getFixedPerfSubjRecords())
-			
-		elif event.getMessage()=="Promt":
-			print(event.getPayload())
-		elif event.getMessage()=="UnfinishedSourcesStat":
-			if event.getPayload()!=():
-				print("\nUnfinished sources:")
-				for record in event.getPayload():
-					subject, subjRecordTuple = record
-					print(subject.getDescr()+":")
-					for subjRecord in subjRecordTuple:
-						edSource, stat = subjRecord
-						print(edSource.getDescr(), " ", stat,
-								" MANDATORY=", edSource.isMandatory())
-			print("")
-					
-				
-			
+	def __printPayload(self, event):
+		print(event.getPayload())
+	
+	def __onIntervalDescr(self, event):
+		interval=event.getPayload()
+		print("***", interval.getStartDate(),
+				"-",interval.getEndDate(), "***")
+		print("Subjects with shared training performance:")
+		
+		d = interval.getSharedPerfSubjRecords() # alias
+		for GID in d:
+			print("Group #",GID)
+			self.__showSubjRecords(d[GID])
+		
+		print("Subjects with fixed training performance:")
+		self.__showSubjRecords(interval.getFixedPerfSubjRecords())
+	
+	def __onUnfinishedSourcesStat(self, event):
+		if event.getPayload()!=():
+			print("\nUnfinished sources:")
+			for record in event.getPayload():
+				subject, subjRecordTuple = record
+				print(subject.getDescr()+":")
+				for subjRecord in subjRecordTuple:
+					edSource, stat = subjRecord
+					print(edSource.getDescr(), " ", stat,
+							" MANDATORY=", edSource.isMandatory())
+		print("")
+	
+	def getEventHandlers(self):
+		return {"KeyDate": self.__printPayload,
+				"Interval Descr!": self.__onIntervalDescr,
+				"Promt": self.__printPayload,
+				"UnfinishedSourcesStat": self.__onUnfinishedSourcesStat}
+		
 
+# Items (subjects or ed. sources) with integer IDs (0, 1, ...) and 
+# their data stored by columns: key -> list of values by ID. 
+# None is a missing value.
 class DataBase(object): # issue #3
 	
 	def __init__(self):
 		self.refresh()
 		
 	def refresh(self):
-		self.__db={}
-		self.__idCounter=-1
+		# New storage: rows given by getRows remain valid
+		self.__ids={}
+		self.__items=[]
+		self.__columns={}
 		
 	def regItem(self, item):
-		if item not in self.__db:
-			self.__idCounter+=1
-			self.__db[item]={}
-			self.__db[item]["ID"]=self.__idCounter
+		if item not in self.__ids:
+			self.__ids[item]=len(self.__items)
+			self.__items.append(item)
+			for column in self.__columns.values():
+				column.append(None)
 			
 	def getID(self, item):
-		if item in self.__db:
-			return self.__db[item]["ID"]
-		else:
-			return -1
+		return self.__ids.get(item, -1)
+	
+	def __getColumn(self, key):
+		if key not in self.__columns:
+			self.__columns[key]=[None]*len(self.__items)
+		return self.__columns[key]
 	
 	def addData(self, item, key, date):
 		if key=="ID":
 			raise Exception("Error! Key cannot be 'ID'!")
 			
-		if item in self.__db:
-			if key not in self.__db[item]:
-				self.__db[item][key]=date
+		if item in self.__ids:
+			column=self.__getColumn(key)
+			ID=self.__ids[item]
+			if column[ID]==None:
+				column[ID]=date
 				return 0
 			else:
 				return -1
 		else:
 			raise Exception("Error! No such onbjects in DB")
 	
+	# Sets the value for all items for which it is missing
+	def fillMissing(self, key, value):
+		if key=="ID":
+			raise Exception("Error! Key cannot be 'ID'!")
+		column=self.__getColumn(key)
+		if None in column:
+			column[:]=[value if v==None else v for v in column]
+	
 	def isSet(self, item, key):
-		if item in self.__db:
-			if key in self.__db[item]:
-				return True
-			else:
-				return False
+		if item in self.__ids:
+			return key=="ID" or (key in self.__columns and 
+					self.__columns[key][self.__ids[item]]!=None)
 		else:
 			raise Exception("Error! No such item!")
 	
 	def getData(self, item, key):
-		if item in self.__db:
-			if key in self.__db[item]:
-				return self.__db[item][key]
-			else:
-				raise Exception("Error! No such data!")
+		if self.isSet(item, key):
+			if key=="ID":
+				return self.__ids[item]
+			return self.__columns[key][self.__ids[item]]
 		else:
-			raise Exception("Error! No such item!")
+			raise Exception("Error! No such data!")
+	
+	# Rows (by ID) without copying the data: row["ID"], row[key]
+	def getRows(self):
+		return DataBaseRows(self.__columns, len(self.__items))
 	
+	# Copy of the data: tuple of dicts
 	def makeTuple(self):
 		l= []
-		for item in self.__db:
-			l.append(self.__db[item])
+		for row in self.getRows():
+			l.append(row.toDict())
 		return tuple(l)
 	
 	def getKeysTuple(self):
-		l=[]
-		for key in self.__db:
-			l.append(key)
-		return tuple(l)
+		return tuple(self.__items)
+
+class DataBaseRows(object):
+	__slots__=("__columns", "__nRows")
+	
+	def __init__(self, columns, nRows):
+		self.__columns=columns
+		self.__nRows=nRows
+	
+	def __len__(self):
+		return self.__nRows
+	
+	def __getitem__(self, ID):
+		if ID<0 or ID>=self.__nRows:
+			raise IndexError("Error! No such row!")
+		return DataBaseRow(self.__columns, ID)
+	
+	def __iter__(self):
+		for ID in range(0, self.__nRows):
+			yield DataBaseRow(self.__columns, ID)
+
+# Row of DataBase (also for jinja templates: row.key)
+class DataBaseRow(object):
+	__slots__=("__columns", "__ID")
+	
+	def __init__(self, columns, ID):
+		self.__columns=columns
+		self.__ID=ID
+	
+	def __getitem__(self, key):
+		if key=="ID":
+			return self.__ID
+		value=None
+		if key in self.__columns:
+			value=self.__columns[key][self.__ID]
+		if value==None:
+			raise KeyError(key)
+		return value
+	
+	def get(self, key, default=None):
+		try:
+			return self[key]
+		except KeyError:
+			return default
+	
+	def __contains__(self, key):
+		return self.get(key)!=None
+	
+	def keys(self):
+		return ["ID"]+[key for key in self.__columns 
+				if self.__columns[key][self.__ID]!=None]
+	
+	def toDict(self):
+		return {key: self[key] for key in self.keys()}
 
 class PlantUMLCodeGenerator(IEventListener): # issue #3 
 	PUML_COLORS=[
@@ -915,8 +3489,18 @@ class PlantUMLCodeGenerator(IEventListener): # issue #3
 		"gray",
 		"olive",
 		"yellow"]
+	
+	# Templates of the package (not of the current directory)
+	TEMPLATE_DIR=os.path.join(
+			os.path.dirname(os.path.abspath(__file__)), "Templates")
+	# (template directory, template name) -> compiled template, 
+	# shared by all generators
+	__templateCache={}
 		
-	def __init__(self):
+	def __init__(self, templateDir=None):
+		if templateDir==None:
+			templateDir=PlantUMLCodeGenerator.TEMPLATE_DIR
+		self.__templateDir=templateDir
 		self.__subjDB=DataBase()
 		self.__edSourceDB=DataBase()
 		self.refresh()
@@ -938,74 +3522,86 @@ class PlantUMLCodeGenerator(IEventListener): # issue #3
 		self.__unfinishedSourcesStat=[]
 		self.__fUnfinished=False
 		
-	def onEvent(self, event):
-		if event.getMessage()=="KeyDate":
-			kd = event.getPayload()
-			if kd.getDateType()==DateType.MILESTONE:
-				if self.__startDate==None:
-					self.__startDate=kd.getDate()
-				self.__endDate=kd.getDate()-datetime.timedelta(days=1)
-				ms = kd.getPayload()
-				self.__msList.append(
-					{"date":ms.getDate().isoformat(), 
-					"descr":ms.getDescr()})
-			elif kd.getDateType()==DateType.ED_SOURCE:
-				subjAndSource = kd.getPayload()
-				subj = subjAndSource.getSubject()
-				edSource = subjAndSource.getEdSource()
-				
-				# Data collecting
-				self.__subjDB.regItem(subj) 
-				self.__edSourceDB.regItem(edSource)
-				
-				# determining type of edSource (string)
-				self.__edSourceDB.addData(edSource,"type",
-						edSource.getSourceName())
-				
-				# determining description of edSource (string)
-				self.__edSourceDB.addData(edSource,"name",
-						edSource.getTitle())
-				
-				# determining color
-				self.__edSourceDB.addData(edSource, "color",
-						self.__getColor( self.__subjDB.getID(subj) ) )
-				
-				# determining start and end dates
-				if (kd.getFEnd()):
-					self.__edSourceDB.addData(edSource, "endDate", 
-							kd.getDate().isoformat())
-				else:
-					self.__edSourceDB.addData(edSource, "startDate", 
-							kd.getDate().isoformat())
-			elif kd.getDateType()==DateType.SUBJECT:
-				subj = kd.getPayload()
-				self.__subjDB.regItem(subj)
-				self.__subjDB.addData(subj, "name", subj.getDescr())
-				self.__subjDB.addData(subj, "color", 
-				self.__getColor( self.__subjDB.getID(subj) ) ) 
-				
-		if event.getMessage()=="fVerbose":
-			if event.getPayload()==False:
-				raise Exception("Error! You must use 'verbose'"
-						+" mode in class ImitPlanner!")
-		if event.getMessage()=="Interval Descr!":
-			self.__intervalList.append(
-					event.getPayload().getSimpleDescr())
-		
-		if event.getMessage()=="UnfinishedSourcesStat":
-			if event.getPayload()!=():
-				self.__fUnfinished=True
-			stat = event.getPayload()
-			for record in stat:
-				subj, sourcesList = record
-				for sourceRecord in sourcesList:
-					source, descr = sourceRecord
-					self.__unfinishedSourcesStat.append(
-					{"sourceName": source.getDescr(), 
-							"descr":descr,
-							"mandatory":str(source.isMandatory())})
-							
-			
+	def __onMilestone(self, event):
+		kd = event.getPayload()
+		if self.__startDate==None:
+			self.__startDate=kd.getDate()
+		self.__endDate=kd.getDate()-datetime.timedelta(days=1)
+		ms = kd.getPayload()
+		self.__msList.append(
+			{"date":ms.getDate().isoformat(), 
+			"descr":ms.getDescr()})
+	
+	def __onEdSourceDate(self, event):
+		kd = event.getPayload()
+		subjAndSource = kd.getPayload()
+		subj = subjAndSource.getSubject()
+		edSource = subjAndSource.getEdSource()
+		
+		# Data collecting
+		self.__subjDB.regItem(subj) 
+		self.__edSourceDB.regItem(edSource)
+		# the subject may have been started before the loaded progress
+		self.__subjDB.addData(subj, "name", subj.getDescr())
+		self.__subjDB.addData(subj, "color", 
+				self.__getColor(self.__subjDB.getID(subj)))
+		
+		# determining type of edSource (string)
+		self.__edSourceDB.addData(edSource,"type",
+				edSource.getSourceName())
+		
+		# determining description of edSource (string)
+		self.__edSourceDB.addData(edSource,"name",
+				edSource.getTitle())
+		
+		# determining color
+		self.__edSourceDB.addData(edSource, "color",
+				self.__getColor( self.__subjDB.getID(subj) ) )
+		
+		# determining start and end dates
+		if (kd.getFEnd()):
+			self.__edSourceDB.addData(edSource, "endDate", 
+					kd.getDate().isoformat())
+		else:
+			self.__edSourceDB.addData(edSource, "startDate", 
+					kd.getDate().isoformat())
+	
+	def __onSubjectDate(self, event):
+		subj = event.getPayload().getPayload()
+		self.__subjDB.regItem(subj)
+		self.__subjDB.addData(subj, "name", subj.getDescr())
+		self.__subjDB.addData(subj, "color", 
+		self.__getColor( self.__subjDB.getID(subj) ) ) 
+	
+	def __onFVerbose(self, event):
+		if event.getPayload()==False:
+			raise Exception("Error! You must use 'verbose'"
+					+" mode in class ImitPlanner!")
+	
+	def __onIntervalDescr(self, event):
+		self.__intervalList.append(
+				event.getPayload().getSimpleDescr())
+	
+	def __onUnfinishedSourcesStat(self, event):
+		if event.getPayload()!=():
+			self.__fUnfinished=True
+		stat = event.getPayload()
+		for record in stat:
+			subj, sourcesList = record
+			for sourceRecord in sourcesList:
+				source, descr = sourceRecord
+				self.__unfinishedSourcesStat.append(
+				{"sourceName": source.getDescr(), 
+						"descr":descr,
+						"mandatory":str(source.isMandatory())})
+	
+	def getEventHandlers(self):
+		return {("KeyDate", DateType.MILESTONE): self.__onMilestone,
+				("KeyDate", DateType.ED_SOURCE): self.__onEdSourceDate,
+				("KeyDate", DateType.SUBJECT): self.__onSubjectDate,
+				"fVerbose": self.__onFVerbose,
+				"Interval Descr!": self.__onIntervalDescr,
+				"UnfinishedSourcesStat": self.__onUnfinishedSourcesStat}
 			
 	def __getNDays(self):
 		return (self.__endDate-self.__startDate).days
@@ -1018,7 +3614,36 @@ class PlantUMLCodeGenerator(IEventListener): # issue #3
 		# if self.__getNDays()>0:
 			# raise Expression("Error! nDays doesn't set!")
 			
+	def __getTemplate(self, name):
+		cache=PlantUMLCodeGenerator.__templateCache # alias
+		key=(self.__templateDir, name)
+		if key not in cache:
+			env = Environment(
+					loader=FileSystemLoader(self.__templateDir))
+			cache[key]=env.get_template(name)
+		return cache[key]
+	
+	# Collects the data from the result of genKeyDates(fResult=True) 
+	# instead of the events
+	def loadPlanResult(self, planResult):
+		self.refresh()
+		self.__onFVerbose(Event("fVerbose", planResult.isVerbose()))
+		handlers=self.getEventHandlers()
+		for keyDate in planResult.getKeyDates():
+			handlers[("KeyDate", keyDate.getDateType())](
+					Event("KeyDate", keyDate, keyDate.getDateType()))
+		for interval in planResult.getTimeIntervals():
+			self.__onIntervalDescr(Event("Interval Descr!", interval))
+		self.__onUnfinishedSourcesStat(Event("UnfinishedSourcesStat",
+				planResult.getUnfinishedSourcesStat()))
+	
+	# filename - the name of the file or a file object
 	def genPlantUMLCode(self, filename, title=None):
+		self.writePlantUMLCode(self.genTemplateData(title), filename)
+	
+	# Data for the Gantt template (plain dicts, lists and strings), 
+	# can be passed to another process
+	def genTemplateData(self, title=None):
 		self.__inputValidation()
 		
 		# Determining the start date
@@ -1028,9 +3653,7 @@ class PlantUMLCodeGenerator(IEventListener): # issue #3
 		endDate = self.__endDate.isoformat()
 		
 		# Complete unfinished sources with that end Date
-		for key in self.__edSourceDB.getKeysTuple():
-			if self.__edSourceDB.isSet(key, "endDate")==False:
-				self.__edSourceDB.addData(key,"endDate", endDate)
+		self.__edSourceDB.fillMissing("endDate", endDate)
 			
 			
 		
@@ -1040,20 +3663,449 @@ class PlantUMLCodeGenerator(IEventListener): # issue #3
 		else:
 			scale="daily"
 		
-		fileLoader = FileSystemLoader("./Templates")
-		env = Environment(loader=fileLoader)
-		pUMLTemplate = env.get_template("gantt.tmpl")
-		code = pUMLTemplate.render(title=title,
-				scale=scale,
-				startdate=startDate,
-				msList=self.__msList,
-				edSourceList=self.__edSourceDB.makeTuple(),
-				subjList = self.__subjDB.makeTuple(),
-				intervalList = self.__intervalList,
-				unfinishedSourcesList = self.__unfinishedSourcesStat,
-				fUnfinished = self.__fUnfinished)
-		
-		# write generated code to file
-		puml_file = open(filename, "w")
-		n = puml_file.write(code)
-		puml_file.close()
+		return {"title": title,
+				"scale": scale,
+				"startdate": startDate,
+				"msList": self.__msList,
+				"edSourceList": self.__edSourceDB.getRows(),
+				"subjList": self.__subjDB.getRows(),
+				"intervalList": self.__intervalList,
+				"unfinishedSourcesList": self.__unfinishedSourcesStat,
+				"fUnfinished": self.__fUnfinished}
+	
+	def writePlantUMLCode(self, templateData, filename):
+		pUMLTemplate = self.__getTemplate("gantt.tmpl")
+		code = pUMLTemplate.generate(**templateData)
+		
+		# write generated code to file (chunk by chunk)
+		if hasattr(filename, "write"):
+			filename.writelines(code)
+		else:
+			puml_file = open(filename, "w")
+			try:
+				puml_file.writelines(code)
+			finally:
+				puml_file.close()
+
+# Gantt diagrams (PlantUML code) for many plans. The data of each plan 
+# (PlanResult of genKeyDates(verbose=True, fResult=True)) is collected 
+# in this process, the files are rendered by the worker processes.
+class GanttBatchExporter(object):
+	def __init__(self, targetDir, nWorkers=None, templateDir=None, 
+			chunkSize=16):
+		self.__targetDir=targetDir
+		if nWorkers==None:
+			nWorkers=os.cpu_count() or 1
+		self.__nWorkers=nWorkers
+		self.__templateDir=templateDir
+		self.__chunkSize=chunkSize
+	
+	# fileNames - names of the files in the target directory 
+	# (plan0.plantuml, plan1.plantuml, ... by default)
+	# titles - titles of the diagrams (optional)
+	# Returns a tuple of (path, rendering time in seconds, size in 
+	# bytes) per plan
+	def export(self, planResults, fileNames=None, titles=None):
+		if fileNames==None:
+			fileNames=["plan"+str(i)+".plantuml" 
+					for i in range(0, len(planResults))]
+		if titles==None:
+			titles=[None]*len(planResults)
+		if len(fileNames)!=len(planResults) or \
+				len(titles)!=len(planResults):
+			raise Exception("Error! The numbers of plans, file names"
+					+ " and titles are different!")
+		
+		os.makedirs(self.__targetDir, exist_ok=True)
+		generator=PlantUMLCodeGenerator(self.__templateDir)
+		templateDataList=[]
+		paths=[]
+		for planResult, fileName, title in zip(planResults, fileNames,
+				titles):
+			generator.loadPlanResult(planResult)
+			templateDataList.append(generator.genTemplateData(title))
+			paths.append(os.path.join(self.__targetDir, fileName))
+		
+		with concurrent.futures.ProcessPoolExecutor(
+				max_workers=self.__nWorkers, 
+				initializer=_initGanttWorker,
+				initargs=(self.__templateDir,)) as executor:
+			return tuple(executor.map(_writeGanttInWorker, 
+					templateDataList, paths, 
+					chunksize=self.__chunkSize))
+
+# Gantt diagram as SVG (or HTML page with SVG) without PlantUML. 
+# Uses the data of PlantUMLCodeGenerator.genTemplateData (colors of 
+# the subjects - PUML_COLORS). The file is written element by element, 
+# the rendering time is linear in the number of ed. sources.
+class GanttSVGRenderer(object):
+	ROW_HEIGHT=20
+	BAR_HEIGHT=14
+	LABEL_WIDTH=260
+	HEADER_HEIGHT=60
+	LINE_HEIGHT=16
+	MARGIN=10
+	# pixels per day for the scale of the template data
+	DAY_WIDTH={"daily": 12, "weekly": 3}
+	
+	# filename - the name of the file or a file object
+	def writeSVG(self, templateData, filename):
+		self.__write(self.__genSVG(templateData), filename)
+	
+	# Self-contained HTML page
+	def writeHTML(self, templateData, filename):
+		self.__write(self.__genHTML(templateData), filename)
+	
+	def __write(self, chunks, filename):
+		if hasattr(filename, "write"):
+			filename.writelines(chunks)
+		else:
+			outputFile = open(filename, "w", encoding="utf-8")
+			try:
+				outputFile.writelines(chunks)
+			finally:
+				outputFile.close()
+	
+	def __genHTML(self, templateData):
+		yield "<!DOCTYPE html>\n<html>\n<head>\n"
+		yield "<meta charset=\"utf-8\">\n"
+		if templateData["title"]!=None:
+			yield "<title>"+html.escape(str(templateData["title"])) \
+					+ "</title>\n"
+		yield "</head>\n<body>\n"
+		yield from self.__genSVG(templateData)
+		yield "</body>\n</html>\n"
+	
+	# Lines of the note under the diagram: (text, color or None)
+	def __genNoteLines(self, templateData):
+		yield ("Subjects:", None)
+		for subj in templateData["subjList"]:
+			yield (subj["name"], subj["color"])
+		yield ("Time intervals:", None)
+		for interval in templateData["intervalList"]:
+			yield (interval["startDate"]+" -- "+interval["endDate"]+":",
+					None)
+			for subject in interval["descr"]:
+				yield ("  "+subject["subjName"]+": "
+						+str(subject["subjPerf"])+" units/day", None)
+		if templateData["fUnfinished"]:
+			yield ("Unfinished Sources:", None)
+			for unfinishedSource in \
+					templateData["unfinishedSourcesList"]:
+				yield (unfinishedSource["sourceName"]+": "
+						+unfinishedSource["descr"]+" (Mandatory="
+						+unfinishedSource["mandatory"]+")", None)
+	
+	def __genSVG(self, templateData):
+		R=GanttSVGRenderer # alias
+		edSourceList=templateData["edSourceList"]
+		msList=templateData["msList"]
+		dayWidth=R.DAY_WIDTH[templateData["scale"]]
+		startDate=datetime.date.fromisoformat(templateData["startdate"])
+		
+		# The last day of the diagram
+		endDate=startDate
+		for edSource in edSourceList:
+			endDate=max(endDate, 
+					datetime.date.fromisoformat(edSource["endDate"]))
+		for milestone in msList:
+			endDate=max(endDate, 
+					datetime.date.fromisoformat(milestone["date"]))
+		nDays=(endDate-startDate).days+1
+		
+		def getX(date):
+			return R.LABEL_WIDTH+(datetime.date.fromisoformat(date)
+					-startDate).days*dayWidth
+		
+		nNoteLines=sum(1 for line in self.__genNoteLines(templateData))
+		chartHeight=len(edSourceList)*R.ROW_HEIGHT
+		width=R.LABEL_WIDTH+nDays*dayWidth+R.MARGIN
+		height=R.HEADER_HEIGHT+chartHeight+2*R.MARGIN \
+				+nNoteLines*R.LINE_HEIGHT
+		
+		yield ("<svg xmlns=\"http://www.w3.org/2000/svg\" width=\"%d\""
+				+ " height=\"%d\" font-family=\"sans-serif\""
+				+ " font-size=\"12\">\n") % (width, height)
+		if templateData["title"]!=None:
+			yield ("<text x=\"%d\" y=\"20\" font-size=\"16\">%s"
+					+ "</text>\n") % (R.MARGIN, 
+					html.escape(str(templateData["title"])))
+		
+		# Time scale: the first day of each month (weekly scale) 
+		# or each Monday (daily scale)
+		top=R.HEADER_HEIGHT
+		bottom=top+chartHeight
+		date=startDate
+		while date<=endDate:
+			if (templateData["scale"]=="weekly" and date.day==1) or \
+					(templateData["scale"]=="daily" 
+						and date.weekday()==0):
+				x=getX(date.isoformat())
+				yield ("<line x1=\"%d\" y1=\"%d\" x2=\"%d\" y2=\"%d\""
+						+ " stroke=\"lightgray\"/>\n") \
+						% (x, top-12, x, bottom)
+				yield ("<text x=\"%d\" y=\"%d\" font-size=\"10\">%s"
+						+ "</text>\n") % (x+2, top-2, date.isoformat())
+			date+=datetime.timedelta(days=1)
+		
+		# Milestones
+		for milestone in msList:
+			x=getX(milestone["date"])
+			yield ("<line x1=\"%d\" y1=\"%d\" x2=\"%d\" y2=\"%d\""
+					+ " stroke=\"black\" stroke-dasharray=\"4,3\">"
+					+ "<title>%s: %s</title></line>\n") \
+					% (x, top-30, x, bottom, 
+					html.escape(milestone["descr"]), milestone["date"])
+			# the label is on the left side of the line in the right 
+			# half of the diagram
+			anchor="start"
+			if 2*x>width:
+				anchor="end"
+			yield ("<text x=\"%d\" y=\"%d\" text-anchor=\"%s\">%s"
+					+ "</text>\n") % (x+2, top-18, anchor, 
+					html.escape(milestone["descr"]))
+		
+		# Ed. sources
+		for index in range(0, len(edSourceList)):
+			edSource=edSourceList[index]
+			y=top+index*R.ROW_HEIGHT
+			label=html.escape("("+edSource["type"]+") "
+					+edSource["name"])
+			# the start of the diagram if the start date is unknown
+			sourceStartDate=edSource.get("startDate", 
+					templateData["startdate"])
+			x1=getX(sourceStartDate)
+			x2=getX(edSource["endDate"])+dayWidth # the end day included
+			yield "<text x=\"%d\" y=\"%d\">%s</text>\n" \
+					% (R.MARGIN, y+R.BAR_HEIGHT-2, label)
+			yield ("<rect x=\"%d\" y=\"%d\" width=\"%d\" height=\"%d\""
+					+ " fill=\"%s\" stroke=\"gray\"><title>%s: %s -- %s"
+					+ "</title></rect>\n") \
+					% (x1, y+(R.ROW_HEIGHT-R.BAR_HEIGHT)//2, x2-x1, 
+					R.BAR_HEIGHT, edSource["color"], label, 
+					sourceStartDate, edSource["endDate"])
+		
+		# Note
+		y=bottom+R.MARGIN
+		for text, color in self.__genNoteLines(templateData):
+			y+=R.LINE_HEIGHT
+			x=R.MARGIN
+			if color!=None:
+				yield ("<rect x=\"%d\" y=\"%d\" width=\"10\""
+						+ " height=\"10\" fill=\"%s\"/>\n") \
+						% (x, y-10, color)
+				x+=14
+			yield "<text x=\"%d\" y=\"%d\">%s</text>\n" \
+					% (x, y, html.escape(text))
+		yield "</svg>\n"
+
+# Loading of plans from JSON or TOML (see README: "Plan file format"). 
+# If cacheDir is set, the validated and compiled planner is saved 
+# there (pickle) with the hash of the plan text as the name, and an 
+# unchanged plan is loaded from the cache without parsing and 
+# validation. The cache directory must be trusted.
+class PlanLoader(object):
+	# Change when the format or the library classes change
+	CACHE_VERSION="2"
+	SOURCE_TYPES={"BOOK": Book, "YT VIDEO": YTVideo, 
+			"FTT": FixedTimeTask}
+	PLAN_KEYS={"milestones", "subjects", "accounting"}
+	SUBJECT_KEYS={"name", "startAfter", "sources", "modes"}
+	MILESTONE_KEYS={"date", "descr"}
+	SOURCE_KEYS={"type", "title", "size", "days", "author", 
+			"unitName", "mandatory"}
+	
+	def __init__(self, cacheDir=None):
+		self.__cacheDir=cacheDir
+	
+	# The format is determined by the extension (.json or .toml)
+	def load(self, filename):
+		planFile=open(filename, "rb")
+		try:
+			content=planFile.read()
+		finally:
+			planFile.close()
+		if filename.lower().endswith(".toml"):
+			return self.__load(content, "toml")
+		return self.__load(content, "json")
+	
+	def loadJSON(self, text):
+		return self.__load(text.encode("utf-8"), "json")
+	
+	def loadTOML(self, text):
+		return self.__load(text.encode("utf-8"), "toml")
+	
+	def __load(self, content, planFormat):
+		cacheFilename=None
+		if self.__cacheDir!=None:
+			digest=hashlib.sha256()
+			digest.update((PlanLoader.CACHE_VERSION+":"+planFormat+":")
+					.encode("utf-8"))
+			digest.update(content)
+			cacheFilename=os.path.join(self.__cacheDir, 
+					digest.hexdigest()+".pickle")
+			if os.path.exists(cacheFilename):
+				cacheFile=open(cacheFilename, "rb")
+				try:
+					return pickle.load(cacheFile)
+				finally:
+					cacheFile.close()
+		
+		if planFormat=="toml":
+			if tomllib==None:
+				raise Exception("Error! TOML plans require Python 3.11"
+						+ " (tomllib)!")
+			planDescr=tomllib.loads(content.decode("utf-8"))
+		else:
+			planDescr=json.loads(content)
+		planner=self.makePlanner(planDescr)
+		
+		if cacheFilename!=None:
+			os.makedirs(self.__cacheDir, exist_ok=True)
+			# the file appears only when it is complete
+			tempFilename=cacheFilename+"."+str(os.getpid())+".tmp"
+			cacheFile=open(tempFilename, "wb")
+			try:
+				pickle.dump(planner, cacheFile, 
+						protocol=pickle.HIGHEST_PROTOCOL)
+			finally:
+				cacheFile.close()
+			os.replace(tempFilename, cacheFilename)
+		return planner
+	
+	def __checkKeys(self, descr, keys, what):
+		if not isinstance(descr, dict):
+			raise Exception("Error! "+what+" must be a table!")
+		for key in descr:
+			if key not in keys:
+				raise Exception("Error! Unknown key in "+what+": "
+						+str(key))
+	
+	def __getValue(self, descr, key, what):
+		if key not in descr:
+			raise Exception("Error! No '"+key+"' in "+what+"!")
+		return descr[key]
+	
+	def __makeDate(self, value):
+		if isinstance(value, datetime.date):
+			return value # TOML date
+		try:
+			return datetime.date.fromisoformat(value)
+		except (TypeError, ValueError):
+			raise Exception("Error! Wrong date: "+str(value))
+	
+	# Number or "numerator/denominator"
+	def __makePerf(self, value):
+		if isinstance(value, str):
+			try:
+				return float(fractions.Fraction(value))
+			except ValueError:
+				raise Exception("Error! Wrong performance: "+value)
+		if isinstance(value, bool) or \
+				not isinstance(value, numbers.Real) or value<0:
+			raise Exception("Error! Wrong performance: "+str(value))
+		return value
+	
+	# Positive number (integer if fInteger)
+	def __getPositive(self, descr, key, what, fInteger=False):
+		value=self.__getValue(descr, key, what)
+		numberType=numbers.Integral if fInteger else numbers.Real
+		if isinstance(value, bool) or \
+				not isinstance(value, numberType) or value<=0:
+			raise Exception("Error! '"+key+"' in "+what+" must be a"
+					+ " positive " + ("integer" if fInteger else "number")
+					+ ": "+str(value))
+		return value
+	
+	def __makeSource(self, descr):
+		self.__checkKeys(descr, PlanLoader.SOURCE_KEYS, "source")
+		sourceType=self.__getValue(descr, "type", "source")
+		if sourceType not in PlanLoader.SOURCE_TYPES:
+			raise Exception("Error! Unknown source type: "
+					+str(sourceType))
+		title=self.__getValue(descr, "title", "source")
+		isMandatory=descr.get("mandatory", True)
+		if not isinstance(isMandatory, bool):
+			raise Exception("Error! 'mandatory' in source must be"
+					+ " true or false: "+str(isMandatory))
+		if sourceType=="FTT":
+			return FixedTimeTask(title, 
+					self.__getPositive(descr, "days", "source", True), 
+					isMandatory)
+		return PlanLoader.SOURCE_TYPES[sourceType](title, 
+				self.__getPositive(descr, "size", "source"), 
+				descr.get("author"), descr.get("unitName"), isMandatory)
+	
+	# Builds the planner from the plan description (dict)
+	def makePlanner(self, planDescr):
+		self.__checkKeys(planDescr, PlanLoader.PLAN_KEYS, "plan")
+		
+		subjects={}
+		subjectList=[]
+		trainingModes={}
+		for subjDescr in self.__getValue(planDescr, "subjects", "plan"):
+			self.__checkKeys(subjDescr, PlanLoader.SUBJECT_KEYS, 
+					"subject")
+			name=self.__getValue(subjDescr, "name", "subject")
+			if name in subjects:
+				raise Exception("Error! Duplicate subject: "+str(name))
+			
+			# Previous subjects must be described above
+			startAfter=subjDescr.get("startAfter")
+			if isinstance(startAfter, str):
+				startAfter=[startAfter]
+			prevSubjects=None
+			if startAfter!=None:
+				prevSubjects=[]
+				for prevName in startAfter:
+					if prevName not in subjects:
+						raise Exception("Error! startAfter refers to" 
+								+ " unknown subject: "+str(prevName))
+					prevSubjects.append(subjects[prevName])
+			
+			subject=Subject(name, prevSubjects)
+			sourceDescrList=self.__getValue(subjDescr, "sources", 
+					"subject")
+			if not isinstance(sourceDescrList, list) or \
+					len(sourceDescrList)==0:
+				raise Exception("Error! Subject must have a non-empty"
+						+ " list of sources: "+str(name))
+			for sourceDescr in sourceDescrList:
+				subject.addEdSource(self.__makeSource(sourceDescr))
+			
+			modes=[]
+			for mode in self.__getValue(subjDescr, "modes", "subject"):
+				if not isinstance(mode, list) or \
+						len(mode) not in (2, 3):
+					raise Exception("Error! Training mode must be"
+							+ " [perf, shared flag, GID]: "+str(mode))
+				if isinstance(mode[1], bool) or mode[1] not in (
+						TrainingModesSharedFlag.SharedMode.value,
+						TrainingModesSharedFlag.FixedMode.value):
+					raise Exception("Error! Shared flag of training mode"
+							+ " must be 0 or 1: "+str(mode))
+				modes.append([self.__makePerf(mode[0])]+mode[1:])
+			
+			subjects[name]=subject
+			subjectList.append(subject)
+			trainingModes[subject]=modes
+		
+		planner=ImitPlanner(trainingModes)
+		if "accounting" in planDescr:
+			if planDescr["accounting"] not in \
+					ProgressAccounting.__members__:
+				raise Exception("Error! Unknown accounting: "
+						+str(planDescr["accounting"]))
+			planner.setProgressAccounting(
+					ProgressAccounting[planDescr["accounting"]])
+		for msDescr in self.__getValue(planDescr, "milestones", "plan"):
+			self.__checkKeys(msDescr, PlanLoader.MILESTONE_KEYS,
+					"milestone")
+			planner.addMilestone(Milestone(self.__makeDate(
+					self.__getValue(msDescr, "date", "milestone")),
+					self.__getValue(msDescr, "descr", "milestone")))
+		for subject in subjectList:
+			planner.addSubject(subject)
+		
+		planner.compile() # input validation
+		return planner